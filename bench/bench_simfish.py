@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Benchmarks for the fish tank simulator
+
+    Run with `python bench/bench_simfish.py` from the top of the repository.
+    Each benchmark prints a single line giving its name and result.
+"""
+
+import os
+import random
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+sys.path.insert(0, SRC)
+
+import simfish
+
+
+def best_of(repeat, function):
+    """ Return the shortest time taken by `repeat` calls to the function.
+    """
+    best = None
+    for i in range(repeat):
+        started = time.time()
+        function()
+        elapsed = time.time() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_startup(repeat=10):
+    """ Time how long a fresh interpreter takes to import the simulation
+        core, net of the interpreter's own startup time, and check that
+        curses is not imported along with it.
+    """
+    environment = dict(os.environ, PYTHONPATH=SRC)
+
+    def run(code):
+        return lambda: subprocess.check_call([sys.executable, "-c", code], env=environment)
+
+    bare = best_of(repeat, run("pass"))
+    core = best_of(repeat, run("import simfish"))
+    ui = best_of(repeat, run("import simfish_curses"))
+    check = "import sys, simfish; sys.exit('curses' in sys.modules)"
+    curses_loaded = subprocess.call([sys.executable, "-c", check], env=environment) != 0
+    print("startup: import simfish {0:.1f} ms, import simfish_curses {1:.1f} ms, "
+          "curses loaded by core: {2}".format(1000 * (core - bare), 1000 * (ui - bare), curses_loaded))
+
+
+def bench_turns(population=200, turns=200):
+    """ Time the turns of a tank stocked with a mixed population and fed
+        every turn.
+    """
+    random.seed(0)
+    tank = simfish.Tank(width=60, height=40)
+    species = [simfish.SunFish, simfish.DiverFish, simfish.PiranhaFish, simfish.Snail, simfish.ClockworkFish]
+    for i in range(population):
+        tank.put(random.choice(species)(), x=random.randint(0, tank.width - 1), y=random.randint(0, tank.height - 1))
+
+    def run():
+        for turn in range(turns):
+            tank.put(simfish.FishFood())
+            tank.turn()
+
+    elapsed = best_of(1, run)
+    print("turns: {0:.0f} turns/sec with {1} creatures".format(turns / elapsed, population))
+
+
+def bench_render(frames=1000):
+    """ Time the composition of frames for a stocked tank.
+    """
+    random.seed(0)
+    tank = simfish.Tank()
+    for i in range(50):
+        tank.put(simfish.SunFish(), x=random.randint(0, tank.width - 1), y=random.randint(0, tank.height - 1))
+
+    def run():
+        for frame in range(frames):
+            tank.compose()
+
+    print("render: {0:.0f} frames/sec".format(frames / best_of(3, run)))
+
+
+def bench_batch(size=1000, turns=100):
+    """ Time a batch of default tanks advanced together, in tank-turns per
+        second, against the same number of turns of `Tank` objects run one by
+        one.
+    """
+    try:
+        import simfish_batch
+    except ImportError:
+        print("batch: skipped, NumPy is not installed")
+        return
+    stock = [("SunFish", 10), ("DiverFish", 10), ("PiranhaFish", 2)]
+    batch = simfish_batch.BatchTank(size, capacity=128, seed=0)
+    for name, count in stock:
+        for i in range(count):
+            batch.put(name, y=batch.random.randint(0, batch.height, size))
+
+    def run_batch():
+        for turn in range(turns):
+            batch.put("FishFood")
+            batch.turn()
+
+    random.seed(0)
+    tank = simfish.Tank()
+    for name, count in stock:
+        for i in range(count):
+            tank.put(getattr(simfish, name)(), y=random.randint(0, tank.height - 1))
+
+    def run_tank():
+        for turn in range(turns):
+            tank.put(simfish.FishFood())
+            tank.turn()
+
+    print("batch: {0:.0f} tank-turns/sec batched, {1:.0f} tank-turns/sec one by one".format(
+        size * turns / best_of(1, run_batch), turns / best_of(1, run_tank)))
+
+
+if __name__ == "__main__":
+    bench_startup()
+    bench_turns()
+    bench_render()
+    bench_batch()
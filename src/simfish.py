@@ -2,11 +2,20 @@
 # -*- coding: utf-8 -*-
 
 """ Fish tank simulator
+
+    This module holds the simulation core: the tank, its items and species.
+    It has no dependency upon curses, which is imported by the front end in
+    `simfish_curses` only when the game is played, so headless jobs, tests
+    and worker processes can import it cheaply on any platform. Running this
+    module as a script plays the game.
 """
 
-import curses
+import array
+import collections
+import copy
+import json
+import os
 import random
-import time
 
 TANK_WIDTH  = 15
 TANK_HEIGHT = 10
@@ -23,6 +32,224 @@ class EdgeOfTank(Exception):
         Exception.__init__(self, *args, **kwargs)
 
 
+# Every class of item held within a tank is allocated a single bit, so that the
+# species present within each cell can be summarised as a bitmask.
+_species_bits = {}
+_diets = {}
+_species_masks = {}
+_appetites = {}
+
+
+def species_bit(item):
+    """ Return the bit allocated to the class of the item provided. A new bit
+        is allocated the first time each class is seen and the diet of each
+        Animal is noted for use by `appetite`.
+    """
+    cls = type(item)
+    bit = _species_bits.get(cls)
+    if bit is None:
+        bit = _species_bits[cls] = 1 << len(_species_bits)
+        _species_masks.clear()
+        _appetites.clear()
+    if isinstance(item, Animal):
+        diet = _diets.get(cls, ())
+        extra = tuple(food for food in item.diet if food not in diet)
+        if extra:
+            _diets[cls] = diet + extra
+            _appetites.clear()
+    return bit
+
+
+def species_mask(classes):
+    """ Return the mask of all known species which are instances of any of
+        the classes provided, such as those edible under a particular diet.
+    """
+    classes = tuple(classes)
+    mask = _species_masks.get(classes)
+    if mask is None:
+        mask = 0
+        for cls, bit in _species_bits.items():
+            if issubclass(cls, classes):
+                mask |= bit
+        _species_masks[classes] = mask
+    return mask
+
+
+def appetite(mask):
+    """ Return the mask of all species edible by the animals represented in
+        the species mask provided.
+    """
+    wanted = _appetites.get(mask)
+    if wanted is None:
+        wanted = 0
+        for cls, diet in _diets.items():
+            if mask & _species_bits[cls]:
+                wanted |= species_mask(diet)
+        _appetites[mask] = wanted
+    return wanted
+
+
+class FrameBuffer(object):
+    """ A preallocated character buffer into which a complete tank frame is
+        composed before being handed off in one piece, whether to a curses
+        window, to a file or stream, or to a string. Each frame starts as a
+        copy of the empty tank, into which the sprites of the visible items
+        are sliced. Sprites are encoded once and cached thereafter.
+    """
+
+    # the minimum width reserved for the status line below the tank
+    STATUS_WIDTH = 40
+
+    def __init__(self, width=TANK_WIDTH, height=TANK_HEIGHT, surface=True, floor=True):
+        """ Allocate a frame large enough to display a tank of the width and
+            height provided, measured in tank cells. A frame showing only part
+            of a tank shows the water's surface and the tank floor only if
+            they lie within that part.
+        """
+        self.size = (width, height, surface, floor)
+        inner = UNIT_WIDTH * width
+        self.columns = max(inner + 2, FrameBuffer.STATUS_WIDTH)
+        self.rows = UNIT_HEIGHT * height + 3
+        self.stride = self.columns + 1
+        pad = (self.columns - inner - 2) * " "
+        lines = ["|" + inner * ("~" if surface else " ") + "|" + pad]
+        lines.extend(UNIT_HEIGHT * height * ["|" + inner * " " + "|" + pad])
+        lines.append(("+" + inner * "-" + "+" if floor else "|" + inner * " " + "|") + pad)
+        lines.append(self.columns * " ")
+        self._background = bytearray("\n".join(lines).encode("ascii"))
+        self.buffer = bytearray(self._background)
+        self._sprites = {}
+
+    def clear(self):
+        """ Reset the frame to show an empty tank.
+        """
+        self.buffer[:] = self._background
+
+    def put_sprite(self, x, y, sprite):
+        """ Slice a sprite into the frame at the tank cell specified.
+        """
+        key = tuple(sprite)
+        lines = self._sprites.get(key)
+        if lines is None:
+            lines = [line[:UNIT_WIDTH].encode("ascii") for line in sprite]
+            self._sprites[key] = lines
+        offset = (UNIT_HEIGHT * y + 1) * self.stride + UNIT_WIDTH * x + 1
+        for line in lines:
+            self.buffer[offset:offset + len(line)] = line
+            offset += self.stride
+
+    def put_status(self, text):
+        """ Write a line of text below the tank, replacing any previous one.
+        """
+        offset = (self.rows - 1) * self.stride
+        status = text[:self.columns].encode("ascii")
+        self.buffer[offset:offset + self.columns] = status + (self.columns - len(status)) * b" "
+
+    def lines(self):
+        """ Return the frame as a list of lines of text.
+        """
+        return str(self).split("\n")
+
+    def write(self, stream):
+        """ Write the frame, followed by a newline, to the binary stream
+            provided.
+        """
+        stream.write(self.buffer)
+        stream.write(b"\n")
+
+    def blit(self, window, footer=()):
+        """ Copy the frame to the top left corner of the curses window
+            provided, followed by as many lines of `footer` text provided as
+            the window can fit. Where the window is wide enough, the frame is
+            copied with a single call; otherwise it is copied a line at a
+            time.
+        """
+        rows, columns = window.getmaxyx()
+        if columns > self.columns:
+            window.addstr(0, 0, bytes(self.buffer))
+        else:
+            for y in range(self.rows):
+                offset = y * self.stride
+                window.addstr(y, 0, bytes(self.buffer[offset:offset + self.columns]))
+        for y, line in enumerate(footer[:max(0, rows - self.rows - 1)]):
+            window.addstr(self.rows + y, 0, line[:columns - 1])
+
+    def __str__(self):
+        return self.buffer.decode("ascii")
+
+
+class Viewport(object):
+    """ The rectangle of cells of a tank which is on display, `width` cells
+        across and `height` cells down from the cell at (x, y).
+    """
+
+    def __init__(self, x=0, y=0, width=TANK_WIDTH, height=TANK_HEIGHT):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def fit(self, tank, columns, rows):
+        """ Resize the viewport to the most cells of the tank which fit, with
+            the tank's borders and status line, into the number of columns
+            and rows of characters provided, keeping it within the tank.
+        """
+        self.width = max(1, min(tank.width, (columns - 2) // UNIT_WIDTH))
+        self.height = max(1, min(tank.height, (rows - 3) // UNIT_HEIGHT))
+        self.scroll(tank, 0, 0)
+
+    def scroll(self, tank, dx, dy):
+        """ Move the viewport by the number of cells provided, stopping at the
+            edges of the tank.
+        """
+        self.x = max(0, min(tank.width - self.width, self.x + dx))
+        self.y = max(0, min(tank.height - self.height, self.y + dy))
+
+
+class DensityMap(object):
+    """ The number of individuals within each block of cells of a tank, each
+        block `block_width` cells across and `block_height` cells down, kept
+        up to date by the tank as its items come and go. Drawing a map of
+        the blocks therefore costs the same however large or crowded the
+        tank.
+    """
+
+    # the shades of a block, from empty to the most crowded
+    SHADES = " .:-=+*#%@"
+
+    def __init__(self, tank, block_width, block_height):
+        self.block = (block_width, block_height)
+        self.columns = -(-tank.width // block_width)
+        self.rows = -(-tank.height // block_height)
+        self.counts = array.array("l", [0] * (self.columns * self.rows))
+        # the number of cells in each block, fewer along the far edges
+        widths = [min(block_width, tank.width - column * block_width) for column in range(self.columns)]
+        heights = [min(block_height, tank.height - row * block_height) for row in range(self.rows)]
+        self.areas = [width * height for height in heights for width in widths]
+        for coords, items in tank.cells():
+            for item in items:
+                self.add(coords, item.count)
+
+    def add(self, coords, count):
+        x, y = coords
+        self.counts[(y // self.block[1]) * self.columns + x // self.block[0]] += count
+
+    def copy(self):
+        density = copy.copy(self)
+        density.counts = array.array("l", self.counts)
+        return density
+
+    def lines(self):
+        """ Return the map as a list of lines of text, one character to each
+            block, shaded by the number of individuals per cell of the block
+            in proportion to that of the most crowded block.
+        """
+        densities = [float(count) / area for count, area in zip(self.counts, self.areas)]
+        scale = (len(self.SHADES) - 1) / (max(densities) or 1.0)
+        shades = [" " if density <= 0 else self.SHADES[max(1, int(density * scale))] for density in densities]
+        return ["".join(shades[row * self.columns:(row + 1) * self.columns]) for row in range(self.rows)]
+
+
 class Tank(object):
     """ The tank is the environment in which the aquatic life lives. The
         details of the items themselves is unimportant except that each item
@@ -34,6 +261,12 @@ class Tank(object):
         """ Base class for items to be contained within a tank.
         """
 
+        # the number of individuals represented by this item
+        count = 1
+
+        # whether co-located items of this kind may be merged into stacks
+        stackable = False
+
         def __init__(self):
             pass
 
@@ -72,120 +305,585 @@ class Tank(object):
             except EdgeOfTank:
                 pass
 
-    def __init__(self, temperature=17.0, window=None):
+        def stacks_with(self, other):
+            """ Return true if the other item provided, at the same location,
+                is interchangeable with this one and may be merged into it.
+            """
+            return False
+
+        def absorb(self, other):
+            """ Merge another item, for which `stacks_with` is true, into this
+                one. The other item should then be removed from the tank.
+            """
+            raise TypeError("{0} items cannot be stacked".format(type(self).__name__))
+
+    def __init__(self, temperature=17.0, window=None, width=TANK_WIDTH, height=TANK_HEIGHT):
         """ Create a new tank to be displayed on the curses window supplied.
 
             :param window: a curses window on which to display the tank
+            :param width: the number of cells across the tank
+            :param height: the number of cells from top to bottom of the tank
         """
+        if temperature is None:
+            temperature = 17.0
         self._temperature = temperature
         self.window = window
-        self.width = TANK_WIDTH
-        self.height = TANK_HEIGHT
+        self.width = width
+        self.height = height
+        self.fed = False
+        self.history = None
+        self.scheduler = None
+        self.events = None
+        self.viewport = None
+        self._frame = None
+        self._cow = False
         self.empty()
 
     def __len__(self):
-        """ Return the number of items resident in this tank.
+        """ Return the number of items resident in this tank, counting each
+            individual within a stack of items. The count is kept as items
+            come and go, so this takes constant time.
         """
-        tally = 0
-        for items in self._items.values():
-            tally += len(items)
-        return tally
+        return self._population
 
-    def remove_dead(self):
-        for coords, items in self._items.items():
-            death_list = []
+    def __iter__(self):
+        """ Iterate through all the items resident in this tank.
+        """
+        for coords, items in self.cells():
             for item in items:
+                yield item
+
+    def cells(self):
+        """ Return a list of the co-ordinates and items of every occupied
+            cell, in the order in which the cells were first occupied. The
+            lists of items returned belong to the tank and should not be
+            changed.
+        """
+        return list(self._items.items())
+
+    def _tally(self, coords, item, count):
+        """ Record a change in the number of individuals of the item's species
+            at the co-ordinates provided, in the population of the tank and,
+            if one has been drawn, in the density map.
+        """
+        self._population += count
+        if self._density is not None:
+            self._density.add(coords, count)
+
+    def remove_dead(self):
+        """ Remove all dead creatures from the tank.
+        """
+        removed = []
+        for coords, items in self.cells():
+            for item in items[:]:
                 if isinstance(item, Animal) and not item.alive:
-                    death_list.append(item)
-            for creature in death_list:
-                items.remove(creature)
+                    self._evict(coords, item)
+                    removed.append(item)
+        if removed and self.events is not None:
+            self.events.emit("remove_dead", removed)
 
     def empty(self):
         """ Remove all the items from the tank to empty it.
-            The `_items` dictionary holds a mapping of all (x, y) co-ordinates
-            to a list of the items contained at that location. For example:
+            The `_items` ordered dictionary holds a mapping of all (x, y)
+            co-ordinates to a list of the items contained at that location, in
+            the order in which the cells were occupied. For example:
             {
                  (2, 4): [<Snail object>],
                  (10, 1): [<Food object>, <SunFish object>]
             }
+            Alongside this, the `_masks` dictionary maps the same co-ordinates
+            to the bitwise OR of the `species_bit` of every item held there
+            and the `_positions` dictionary maps each item to its location.
+            The `_population` counts the individuals held by the tank.
+        """
+        if self.events is not None:
+            self.events.emit("empty")
+        self._items = collections.OrderedDict()
+        self._masks = {}
+        self._positions = {}
+        self._shared = False
+        self._owned_cells = set()
+        self._owned_items = set()
+        self._piles = set()
+        self._population = 0
+        self._density = None
+
+    def fork(self):
+        """ Return a new tank which starts as an exact copy of this one but
+            thereafter evolves independently, for exploring alternative
+            futures. The fork itself takes constant time: the two tanks share
+            their cells and items, copy-on-write. The cost of copying is
+            deferred rather than avoided, and each tank pays it in proportion
+            to its population. The first change to either tank makes a
+            shallow copy of its index dictionaries, and each cell list and
+            each item is copied when that tank first changes it. Every item
+            takes part in a turn, so a tank's first turn after forking copies
+            all of its items, after which the tank holds nothing shared and
+            drops its copy-on-write bookkeeping. The fork has no window,
+            history or subscribers of its own, but takes a copy of any
+            scheduled actions.
+
+            Items within a forked tank should only be changed through the
+            tank, since an item held outside may be shared by both tanks.
+        """
+        fork = copy.copy(self)
+        fork.window = None
+        fork.history = None
+        fork.events = None
+        fork.viewport = None
+        if self.scheduler is not None:
+            fork.scheduler = self.scheduler.copy()
+        fork._frame = None
+        fork._piles = set(self._piles)
+        for tank in (self, fork):
+            tank._cow = True
+            tank._shared = True
+            tank._owned_cells = set()
+            tank._owned_items = set()
+        return fork
+
+    def _unshare(self):
+        """ Take private copies of the index dictionaries last shared with
+            another tank on forking.
+        """
+        self._items = collections.OrderedDict(self._items)
+        self._masks = dict(self._masks)
+        self._positions = dict(self._positions)
+        if self._density is not None:
+            self._density = self._density.copy()
+        self._shared = False
+
+    def _settle(self):
+        """ Stop copying-on-write once every cell and item of this tank is its
+            own copy, shared with no other tank.
+        """
+        if len(self._owned_items) == len(self._positions) and len(self._owned_cells) == len(self._items):
+            self._cow = False
+            self._owned_cells = set()
+            self._owned_items = set()
+
+    def _cell(self, coords):
+        """ Return the list of items at the co-ordinates provided, ready to be
+            changed, copying it first if it is still shared with another tank.
+        """
+        if self._shared:
+            self._unshare()
+        items = self._items[coords]
+        if self._cow and coords not in self._owned_cells:
+            items = self._items[coords] = list(items)
+            self._owned_cells.add(coords)
+        return items
+
+    def _own(self, item):
+        """ Return the item provided, ready to be changed, replacing it with a
+            copy first if it is still shared with another tank.
         """
-        self._items = {}
+        if not self._cow or item in self._owned_items:
+            return item
+        coords = self._positions[item]
+        items = self._cell(coords)
+        clone = copy.copy(item)
+        items[items.index(item)] = clone
+        del self._positions[item]
+        self._positions[clone] = coords
+        self._owned_items.add(clone)
+        return clone
+
+    def _add(self, coords, item, before=None):
+        """ Add an item to the cell at the co-ordinates provided, at the end
+            of the cell or, if provided, just ahead of the item `before`.
+        """
+        if self._shared:
+            self._unshare()
+        bit = species_bit(item)
+        if coords in self._items:
+            if item.stackable and self._masks[coords] & bit:
+                self._piles.add(coords)
+            items = self._cell(coords)
+            if before is None:
+                items.append(item)
+            else:
+                items.insert(items.index(before), item)
+            self._masks[coords] |= bit
+        else:
+            self._items[coords] = [item]
+            self._masks[coords] = bit
+            if self._cow:
+                self._owned_cells.add(coords)
+        self._positions[item] = coords
+        self._tally(coords, item, item.count)
+
+    def _discard(self, coords, item):
+        """ Remove an item from the cell at the co-ordinates provided.
+        """
+        items = self._cell(coords)
+        items.remove(item)
+        del self._positions[item]
+        self._tally(coords, item, -item.count)
+        if items:
+            mask = 0
+            for other in items:
+                mask |= species_bit(other)
+            self._masks[coords] = mask
+        else:
+            del self._items[coords]
+            del self._masks[coords]
+            self._owned_cells.discard(coords)
+
+    def _evict(self, coords, item):
+        """ Remove an item from the tank altogether, from the cell at the
+            co-ordinates provided.
+        """
+        self._discard(coords, item)
+        if self._cow:
+            self._owned_items.discard(item)
+
+    def _compact(self, coords):
+        """ Merge together the interchangeable stackable items which share the
+            cell at the co-ordinates provided. Only neighbours within the cell
+            are merged, so that every individual keeps its place in the order
+            in which the items of the cell take their turns and their meals.
+        """
+        stack = None
+        for item in self._items[coords][:]:
+            if stack is not None and item.stackable and stack.stacks_with(item):
+                stack = self._own(stack)
+                stack.absorb(item)
+                self._tally(coords, stack, item.count)
+                self._evict(coords, item)
+            else:
+                stack = item
+
+    def compact(self):
+        """ Merge the stackable items, such as FishFood, which have come to
+            share a cell. Items in a stack go on to behave exactly as they
+            would have individually, so this is done at the end of each turn
+            rather than as items move, when they might not yet have taken
+            the same number of turns.
+        """
+        for coords in self._piles:
+            if coords in self._items:
+                self._compact(coords)
+        self._piles.clear()
 
     def put(self, item, x=None, y=None):
         """ Place the item provided within the tank. If provided, use the x and
             y co-ordinates supplied, otherwise place at the top of the tank at
-            a random horizontal position.
+            a random horizontal position. Outside of a turn, a stackable item
+            placed with others of its kind is merged into their stack.
         """
         if x is None:
             x = random.randint(0, self.width - 1)
         if y is None:
             y = 0
-        self.remove(item)
-        if (x, y) in self._items:
-            self._items[(x, y)].append(item)
-        else:
-            self._items[(x, y)] = [item]
+        coords = self._positions.get(item)
+        if coords is not None:
+            self._discard(coords, item)
+        elif self._cow:
+            # a newcomer to the tank belongs to this tank alone
+            self._owned_items.add(item)
+        self._add((x, y), item)
+        if self.events is not None:
+            self.events.emit("put" if coords is None else "move", item, x, y)
+        if coords is None and not self.fed and (x, y) in self._piles:
+            self._piles.discard((x, y))
+            self._compact((x, y))
+
+    def take(self, item):
+        """ Take a single individual from the stack of items provided, such
+            as a school of fish or a stack of FishFood, and return the energy
+            which it holds.
+        """
+        item = self._own(item)
+        energy = item.take()
+        self._tally(self._positions[item], item, -1)
+        return energy
 
     def remove(self, item):
         """ Remove the item provided from the tank.
         """
-        empties = []
-        for coords, items in self._items.items():
-            if item in items:
-                items.remove(item)
-                if not items:
-                    empties.append(coords)
-                break
-        for empty in empties:
-            del self._items[empty]
+        coords = self._positions.get(item)
+        if coords is not None:
+            self._evict(coords, item)
+            if self.events is not None:
+                self.events.emit("remove", item)
 
     def items_with(self, item):
         """ Fetch a list of all items which overlap the item provided.
         """
-        for items in self._items.values():
-            if item in items:
-                other_items = items[:]
-                other_items.remove(item)
-                return other_items
-        return []
+        coords = self._positions.get(item)
+        if coords is None:
+            return []
+        other_items = self._items[coords][:]
+        other_items.remove(item)
+        return other_items
+
+    def items_near(self, item, radius, species=None):
+        """ Fetch a list of all other items within `radius` cells of the item
+            provided, horizontally, vertically or diagonally. If `species` is
+            supplied, as a class or tuple of classes, only items of matching
+            species are returned. Only the cells within range are examined,
+            so the cost depends upon the local density of the tank rather
+            than upon its total population.
+        """
+        try:
+            x0, y0 = self._positions[item]
+        except KeyError:
+            raise ValueError("Item not found in fish tank")
+        mask = -1 if species is None else self._species_mask(species)
+        found = []
+        for coords in self._cells_within(x0, y0, radius):
+            if self._masks[coords] & mask:
+                for other in self._items[coords]:
+                    if other is not item and (species is None or isinstance(other, species)):
+                        found.append(other)
+        return found
+
+    def nearest(self, item, species):
+        """ Return the nearest other item of the species provided (a class or
+            tuple of classes) to the item given, or None if there is none.
+            Distance is measured in moves, so diagonal neighbours are as near
+            as those directly adjacent. Rings of cells are searched outwards
+            from the item, so the search stops as soon as a match is found.
+        """
+        try:
+            x0, y0 = self._positions[item]
+        except KeyError:
+            raise ValueError("Item not found in fish tank")
+        mask = self._species_mask(species)
+        for radius in range(max(self.width, self.height)):
+            if (2 * radius + 1) ** 2 > len(self._items):
+                # the ring has outgrown the tank's occupied cells
+                break
+            for coords in self._ring(x0, y0, radius):
+                if self._masks.get(coords, 0) & mask:
+                    for other in self._items[coords]:
+                        if other is not item and isinstance(other, species):
+                            return other
+        best, best_distance = None, None
+        for (x, y), items in self._items.items():
+            if self._masks[(x, y)] & mask:
+                distance = max(abs(x - x0), abs(y - y0))
+                if best_distance is None or distance < best_distance:
+                    for other in items:
+                        if other is not item and isinstance(other, species):
+                            best, best_distance = other, distance
+                            break
+        return best
+
+    def _species_mask(self, species):
+        if isinstance(species, tuple):
+            return species_mask(species)
+        return species_mask((species,))
+
+    def _cells_within(self, x0, y0, radius):
+        """ Return the occupied cells within `radius` cells of (x0, y0),
+            looking up each cell in range or, if there are fewer occupied
+            cells than that, filtering the occupied cells instead.
+        """
+        x_min, x_max = max(0, x0 - radius), min(self.width - 1, x0 + radius)
+        y_min, y_max = max(0, y0 - radius), min(self.height - 1, y0 + radius)
+        return self._cells_in(x_min, x_max, y_min, y_max)
+
+    def _cells_in(self, x_min, x_max, y_min, y_max):
+        """ Return the occupied cells within the rectangle of cells provided,
+            whichever is the cheaper of looking up each cell of the rectangle
+            or filtering the occupied cells.
+        """
+        if (x_max - x_min + 1) * (y_max - y_min + 1) > len(self._items):
+            return [(x, y) for (x, y) in self._items
+                    if x_min <= x <= x_max and y_min <= y <= y_max]
+        return [(x, y) for y in range(y_min, y_max + 1) for x in range(x_min, x_max + 1)
+                if (x, y) in self._items]
+
+    def _ring(self, x0, y0, radius):
+        """ Generate the co-ordinates of the cells exactly `radius` cells away
+            from (x0, y0) which lie within the tank.
+        """
+        if radius == 0:
+            yield x0, y0
+            return
+        x_min, x_max = max(0, x0 - radius), min(self.width - 1, x0 + radius)
+        for y in (y0 - radius, y0 + radius):
+            if 0 <= y < self.height:
+                for x in range(x_min, x_max + 1):
+                    yield x, y
+        for x in (x0 - radius, x0 + radius):
+            if 0 <= x < self.width:
+                for y in range(max(0, y0 - radius + 1), min(self.height, y0 + radius)):
+                    yield x, y
+
+    def fits(self, item, dx, dy):
+        """ Return true if the item provided could be moved by the amounts
+            supplied without leaving the tank.
+        """
+        x, y = self._positions[item]
+        return 0 <= x + dx < self.width and 0 <= y + dy < self.height
 
     def move(self, item, dx, dy):
         """ Move the item provided by the horizontal and vertical amounts
             supplied within `dx` and `dy` respectively.
         """
-        for (x, y), items in self._items.items():
-            if item in items:
-                x += dx
-                y += dy
-                if 0 <= x < self.width and 0 <= y < self.height:
-                    self.put(item, x, y)
-                    return
-                else:
-                    raise EdgeOfTank()
-        raise ValueError("Item not found in fish tank")
+        try:
+            x, y = self._positions[item]
+        except KeyError:
+            raise ValueError("Item not found in fish tank")
+        x += dx
+        y += dy
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.put(item, x, y)
+        else:
+            raise EdgeOfTank()
+
+    def feed(self):
+        """ Settle all meals for the current turn, cell by cell. Cells in
+            which no resident species can eat any other resident species are
+            skipped on the strength of their species mask alone. Within each
+            remaining cell, every hungry animal eats at most one edible item,
+            in the order in which the animals arrived. Members of a school
+            eat individually, those which have eaten splitting off from the
+            rest of the school.
+        """
+        for coords, items in list(self._items.items()):
+            mask = self._masks[coords]
+            if not mask & appetite(mask):
+                continue
+            if self._cow:
+                items = self._cell(coords)
+            eaten = set()
+            index = 0
+            while index < len(items):
+                animal = items[index]
+                index += 1
+                if animal in eaten or not isinstance(animal, Animal) or not animal.hungry(self):
+                    continue
+                diet = tuple(animal.diet)
+                hungry = animal.count
+                for food in items:
+                    if food is not animal and food not in eaten and isinstance(food, diet):
+                        meals = min(hungry, food.count)
+                        for meal in range(meals):
+                            if food.count > 1:
+                                food = self._own(food)
+                                energy = food.take()
+                                self._tally(coords, food, -1)
+                            else:
+                                eaten.add(food)
+                                energy = food.energy
+                        # replaces the animal within `items` if shared
+                        animal = self._own(animal)
+                        if meals < animal.count:
+                            # the members which have eaten are split off
+                            # ahead of the rest, which are not visited again
+                            diner = self.split(animal, meals)
+                            index += 1
+                        else:
+                            diner = animal
+                        diner.energy += energy
+                        if self.events is not None:
+                            self.events.emit("eat", diner, food, energy)
+                        # only one meal per turn
+                        hungry -= meals
+                        if not hungry:
+                            break
+            for food in eaten:
+                self._evict(coords, food)
+
+    def split(self, item, count):
+        """ Split `count` individuals off from a stack of items, such as a
+            school of fish, into a new stack at the same location, which is
+            returned. The new stack is placed just ahead of the original
+            within its cell, standing for the first members of the stack.
+        """
+        if not 0 < count < item.count:
+            raise ValueError("Cannot split {0} from a stack of {1}".format(count, item.count))
+        item = self._own(item)
+        coords = self._positions[item]
+        clone = copy.copy(item)
+        clone.count = count
+        item.count -= count
+        self._tally(coords, item, -count)
+        self._add(coords, clone, before=item)
+        if self._cow:
+            self._owned_items.add(clone)
+        return clone
+
+    def warm(self, steps=1):
+        """ Increase the tank temperature by 0.1 degrees for each step.
+        """
+        self._temperature += 0.1 * steps
+        if self.events is not None:
+            self.events.emit("warm", self._temperature)
 
-    def warm(self):
-        """ Increase the tank temperature by 0.1 degrees.
+    def cool(self, steps=1):
+        """ Decrease the tank temperature by 0.1 degrees for each step.
         """
-        self._temperature += 0.1
+        self._temperature -= 0.1 * steps
+        if self.events is not None:
+            self.events.emit("cool", self._temperature)
+
+    def subscribe(self, callback, topics=None):
+        """ Subscribe a callback to the events of this tank, or only to those
+            of the topics listed. Events are delivered in batches, as a list
+            of tuples each starting with its topic, once at the end of each
+            turn. Return the subscription, for use with `unsubscribe`.
+        """
+        if self.events is None:
+            self.events = EventBus()
+        return self.events.subscribe(callback, topics)
 
-    def cool(self):
-        """ Decrease the tank temperature by 0.1 degrees.
+    def unsubscribe(self, subscription):
+        """ Cancel a subscription made with `subscribe`. Once none remain,
+            the tank emits no events at all.
         """
-        self._temperature -= 0.1
+        if self.events is not None:
+            self.events.unsubscribe(subscription)
+            if not self.events.subscriptions:
+                self.events = None
 
     def temperature(self):
         """ Return the current tank temperature.
         """
         return self._temperature
 
+    def schedule(self, delay, action, period=None):
+        """ Schedule an action, a callable taking the tank as its argument, to
+            be carried out at the start of the turn `delay` turns from now,
+            and then every `period` turns if a period is provided. This suits
+            automatic feeders, thermostat programs and periodic sweeps of the
+            dead. Return the `Event` scheduled, which may be cancelled.
+        """
+        if self.scheduler is None:
+            self.scheduler = TimingWheel()
+        return self.scheduler.schedule(delay, action, period)
+
     def turn(self):
         """ Iterate a single cycle of the items within the tank. Also
-            provides random temperature variation.
+            provides random temperature variation. Scheduled actions which
+            fall due are carried out first. All meals are then settled by
+            `feed` before the items take their turns, so animals do not eat
+            again during their own turn.
         """
-        for coords, items in self._items.items():
-            for item in items:
+        if self.scheduler is not None:
+            for event in self.scheduler.advance():
+                if not event.cancelled:
+                    event.action(self)
+        self.feed()
+        self.fed = True
+        deaths = self.events is not None and "kill" in self.events.topics
+        try:
+            for item in list(self):
+                if self._cow:
+                    item = self._own(item)
+                living = deaths and isinstance(item, Animal) and item.alive
                 item.turn(self)
+                if living and not item.alive:
+                    self.events.emit("kill", item)
+        finally:
+            self.fed = False
+        self.compact()
+        if self._cow:
+            self._settle()
         n = random.random()
         if self._temperature > 15.0:
             if n < 0.3:
@@ -197,25 +895,80 @@ class Tank(object):
                 self.cool()
             elif n >= 0.7:
                 self.warm()
+        if self.history is not None:
+            self.history.record(self)
+        if self.events is not None:
+            self.events.flush()
+
+    def compose(self, frame=None):
+        """ Compose the tank into the `FrameBuffer` provided and return it. If
+            no frame is provided, a buffer kept by the tank for the purpose is
+            reused from one call to the next. If the tank has a `viewport`,
+            only the cells within it are composed, so the cost is bounded by
+            the size of the viewport rather than that of the tank.
+        """
+        view = self.viewport
+        if view is None:
+            x0, y0, width, height = 0, 0, self.width, self.height
+        else:
+            x0, y0, width, height = view.x, view.y, view.width, view.height
+        if frame is None:
+            size = self.frame_size()
+            if self._frame is None or self._frame.size != size:
+                self._frame = FrameBuffer(*size)
+            frame = self._frame
+        frame.clear()
+        if view is None:
+            cells = self.cells()
+        else:
+            cells = [(coords, self._items[coords])
+                     for coords in self._cells_in(x0, x0 + width - 1, y0, y0 + height - 1)]
+        for (x, y), items in cells:
+            if items:
+                frame.put_sprite(x - x0, y - y0, items[0].sprite)
+        status = "tank temperature is {0:.1f} degrees".format(self._temperature)
+        if (width, height) != (self.width, self.height):
+            status += " at {0},{1} of {2}x{3}".format(x0, y0, self.width, self.height)
+        frame.put_status(status)
+        return frame
+
+    def frame_size(self):
+        """ Return the size of the `FrameBuffer` which `compose` needs to
+            show the tank, or its viewport if it has one, as a tuple of the
+            arguments with which to create it.
+        """
+        view = self.viewport
+        if view is None:
+            return (self.width, self.height, True, True)
+        return (view.width, view.height, view.y == 0, view.y + view.height == self.height)
+
+    def minimap(self, columns, rows):
+        """ Return a map of the whole tank, no more than `columns` characters
+            across and `rows` lines down, as a list of lines of text in which
+            each character is shaded by the number of individuals within the
+            block of cells it represents. The blocks are counted as items
+            come and go, so drawing the map costs the same however large or
+            crowded the tank.
+        """
+        block = (-(-self.width // columns), -(-self.height // rows))
+        if self._density is None or self._density.block != block:
+            self._density = DensityMap(self, *block)
+        return self._density.lines()
+
+    def render(self):
+        """ Render the tank as a list of lines of text, exactly as `draw`
+            would display it. This requires no curses window and so may be
+            used to capture frames from a headless tank.
+        """
+        return self.compose().lines()
 
-    def draw(self):
-        """ Draw the tank to the window supplied on construction.
+    def draw(self, footer=()):
+        """ Draw the tank to the window supplied on construction, followed by
+            as many lines of `footer` text provided as the window can fit.
         """
         if self.window is None:
             return
-        self.window.erase()
-        self.window.addstr(0, 0, "|" + UNIT_WIDTH * self.width * "~" + "|")
-        for y in range(UNIT_HEIGHT * self.height):
-            self.window.addstr(y + 1, 0, "|")
-            self.window.addstr(y + 1, UNIT_WIDTH * self.width + 1, "|")
-        self.window.addstr(UNIT_HEIGHT * self.height + 1, 0, "+" + UNIT_WIDTH * self.width * "-" + "+")
-        for (x, y), items in self._items.items():
-            if items:
-                for i, line in enumerate(items[0].sprite):
-                    self.window.addnstr(UNIT_HEIGHT * y + i + 1, UNIT_WIDTH * x + 1, line, UNIT_WIDTH)
-        self.window.addstr(UNIT_HEIGHT * TANK_HEIGHT + 2, 0,
-            "tank temperature is {0:.1f} degrees".format(self._temperature)
-        )
+        self.compose().blit(self.window, footer)
         self.window.refresh()
 
 
@@ -237,11 +990,46 @@ class FishFood(OrganicItem):
         naturally sink to the bottom of the tank it is in.
     """
 
+    stackable = True
+
     def __init__(self, energy=10):
         """ Create a new lump of FishFood containing the amount of energy
             provided.
         """
         OrganicItem.__init__(self, energy=energy)
+        self.count = 1
+
+    @classmethod
+    def stack(cls, count, energy=10):
+        """ Create a stack of `count` portions of FishFood, each containing
+            the amount of energy provided.
+        """
+        food = cls(energy=energy * count)
+        food.count = count
+        return food
+
+    def stacks_with(self, other):
+        """ Lumps of FishFood stack with others whose portions hold the same
+            energy, so that every portion of a stack is the same.
+        """
+        return type(other) is type(self) and self.energy * other.count == other.energy * self.count
+
+    def absorb(self, other):
+        """ Add the portions of another stack of FishFood to this one.
+        """
+        self.count += other.count
+        self.energy += other.energy
+
+    def take(self):
+        """ Remove a single portion from this stack of FishFood and return
+            the energy which it holds.
+        """
+        portion, remainder = divmod(self.energy, self.count)
+        if remainder:
+            portion = self.energy / float(self.count)
+        self.energy -= portion
+        self.count -= 1
+        return portion
 
     @property
     def sprite(self):
@@ -289,16 +1077,34 @@ class Animal(OrganicItem):
         if self.alive:
             self.energy -= 1
 
+    def hungry(self, tank):
+        """ Return true if this animal will look for a meal this turn.
+        """
+        return self.alive
+
+    def take(self):
+        """ Remove a single member from this school of animals and return
+            the energy which it holds.
+        """
+        self.count -= 1
+        return self.energy
+
     def eat(self, tank):
         """ Consume one item from the tank which is at the same location and
             is edible by this animal. If more than one such item exists, only
-            one will be eaten per turn.
+            one will be eaten per turn. Nothing is eaten if the tank has
+            already settled the meals for this turn.
         """
+        if getattr(tank, "fed", False):
+            return
         items = tank.items_with(self)
         for item in items:
             if isinstance(item, tuple(self.diet)):
-                tank.remove(item)
-                self.energy += item.energy
+                if item.count > 1:
+                    self.energy += tank.take(item)
+                else:
+                    tank.remove(item)
+                    self.energy += item.energy
                 # only one meal per turn
                 break
 
@@ -331,6 +1137,9 @@ class Mobile(object):
             EdgeOfTank exception is encountered then a reversal of direction
             is forced.
         """
+        if self.count > 1:
+            self._swim_school(tank)
+            return
         if random.random() < self.reversal:
             self.reverse()
             return
@@ -345,146 +1154,206 @@ class Mobile(object):
         except EdgeOfTank:
             self.reverse()
 
-
-class Snail(Mobile, Animal):
-
-    ENERGY = 120
-
-    def __init__(self, direction=None):
-        Animal.__init__(self, energy=Snail.ENERGY, diet=[FishFood])
-        Mobile.__init__(self, direction, reversal=0.1, upward=0.2, downward=0.2)
-
-    @property
-    def sprite(self):
-        if self.direction < 0:
-            if self.alive:
-                return ["oo   ",
-                        "[_(@)"]
+    def _swim_school(self, tank):
+        """ Each member of a school chooses its course independently, drawing
+            the same random numbers as a lone swimmer would. The members bound
+            for each cell then move there as one group, the groups leaving in
+            the order in which their first members would have left alone,
+            while those which reverse, or would leave the tank, stay behind
+            as the school. This leaves the tank exactly as if the members had
+            swum one by one.
+        """
+        groups = {}
+        order = []
+        staying = 0
+        for member in range(self.count):
+            if random.random() < self.reversal:
+                staying += 1
+                continue
+            n = random.random()
+            if n < self.upward:
+                dy = -1
+            elif n >= 1.0 - self.downward:
+                dy = 1
             else:
-                return ["xx   ",
-                        "[_(@)"]
-        else:
-            if self.alive:
-                return ["   oo",
-                        "(@)_]"]
+                dy = 0
+            if not tank.fits(self, self.direction, dy):
+                staying += 1
+            elif dy in groups:
+                groups[dy] += 1
             else:
-                return ["   xx",
-                        "(@)_]"]
+                groups[dy] = 1
+                order.append(dy)
+        for dy in order:
+            group = self if groups[dy] == self.count else tank.split(self, groups[dy])
+            tank.move(group, group.direction, dy)
+        if staying:
+            self.reverse()
 
-    def turn(self, tank):
-        if self.alive:
-            self.breathe()
-            self.eat(tank)
-            self.swim(tank)
-        else:
-            self.sink(tank)
 
+class Species(Mobile, Animal):
+    """ A Species is a Mobile Animal whose characteristics are defined within
+        a `SpeciesRegistry` rather than in code. Each species is a subclass
+        generated by the registry, within which `REGISTRY` and `SPECIES` give
+        the registry and the index of the species within its tables.
+    """
 
-class SunFish(Mobile, Animal):
+    REGISTRY = None
+    SPECIES = None
 
-    ENERGY = 300
+    # identical members of a species at the same location form a school
+    stackable = True
 
     def __init__(self, direction=None):
-        Animal.__init__(self, energy=SunFish.ENERGY, diet=[FishFood])
-        Mobile.__init__(self, direction, reversal=0.1, upward=0.3, downward=0.1)
-
-    @property
-    def sprite(self):
-        if self.direction < 0:
-            if self.alive:
-                return ["/o \\/",
-                        ")__/\\"]
-            else:
-                return ["/  \\/",
-                        "\\x_/\\"]
-        else:
-            if self.alive:
-                return ["\\/ o\\",
-                        "/\\__("]
-            else:
-                return ["\\/  \\",
-                        "/\\_x/"]
-
-    def turn(self, tank):
-        if self.alive:
-            self.breathe()
-            self.eat(tank)
-            self.swim(tank)
-        else:
-            self.float_(tank)
-
+        Animal.__init__(self, energy=self.ENERGY, diet=self.REGISTRY.diet[self.SPECIES])
+        # movement probabilities are read from the class, not the instance
+        self.direction = direction or random.choice([EAST, WEST])
 
-class DiverFish(Mobile, Animal):
+    @classmethod
+    def school(cls, count, direction=None):
+        """ Create a school of `count` identical members of this species,
+            represented by a single item.
+        """
+        fish = cls(direction)
+        fish.count = count
+        return fish
 
-    ENERGY = 180
+    def stacks_with(self, other):
+        """ Members of a species stack into a school with others of the same
+            species, energy and direction, which will behave identically.
+        """
+        return type(other) is type(self) and other.energy == self.energy and other.direction == self.direction
 
-    def __init__(self, direction=None):
-        Animal.__init__(self, energy=DiverFish.ENERGY, diet=[FishFood])
-        Mobile.__init__(self, direction, reversal=0.1, upward=0.1, downward=0.3)
+    def absorb(self, other):
+        self.count += other.count
 
     @property
     def sprite(self):
-        if self.direction < 0:
-            if self.alive:
-                return ["/- \\/",
-                        ")__/\\"]
-            else:
-                return ["/  \\/",
-                        "\\x_/\\"]
-        else:
-            if self.alive:
-                return ["\\/ -\\",
-                        "/\\__("]
-            else:
-                return ["\\/  \\",
-                        "/\\_x/"]
-
-    def turn(self, tank):
-        if self.alive:
-            self.breathe()
-            self.eat(tank)
-            self.swim(tank)
-        else:
-            self.float_(tank)
-
+        return self.REGISTRY.sprites[self.SPECIES][self.alive][self.direction > 0]
 
-class PiranhaFish(Mobile, Animal):
-
-    ENERGY = 180
-
-    def __init__(self, direction=None):
-        Animal.__init__(self, energy=PiranhaFish.ENERGY, diet=[FishFood, SunFish, DiverFish])
-        Mobile.__init__(self, direction, reversal=0.1, upward=0.2, downward=0.2)
-
-    @property
-    def sprite(self):
-        if self.direction < 0:
-            if self.alive:
-                return ["/o \\/",
-                        "::_/\\"]
-            else:
-                return [":: \\/",
-                        "\\x_/\\"]
-        else:
-            if self.alive:
-                return ["\\/ o\\",
-                        "/\\_::"]
-            else:
-                return ["\\/ ::",
-                        "/\\_x/"]
+    def hungry(self, tank):
+        """ No species will eat if the water is too cold for it to live.
+        """
+        return self.alive and tank.temperature() >= self.REGISTRY.min_temperature[self.SPECIES]
 
     def turn(self, tank):
         if self.alive:
-            if tank.temperature() < 15.0:
+            if tank.temperature() < self.REGISTRY.min_temperature[self.SPECIES]:
                 self.kill()
             else:
                 self.breathe()
                 self.eat(tank)
                 self.swim(tank)
+        elif self.REGISTRY.sinks[self.SPECIES]:
+            self.sink(tank)
         else:
             self.float_(tank)
 
 
+class SpeciesRegistry(object):
+    """ A collection of species definitions compiled into dense tables, each
+        a list indexed by species number, together with a `Species` subclass
+        for each definition. A definition is a dictionary such as:
+
+            {
+                "name": "SunFish",
+                "description": "Sun fish enjoy the light...",
+                "energy": 300,
+                "diet": ["FishFood"],
+                "reversal": 0.1,
+                "upward": 0.3,
+                "downward": 0.1,
+                "death": "float",
+                "min_temperature": 15.0,
+                "sprites": {
+                    "west": {"alive": [...], "dead": [...]},
+                    "east": {"alive": [...], "dead": [...]}
+                }
+            }
+
+        The diet may name other species within the registry or any of the
+        `others` classes supplied. The death behaviour is either "sink" or
+        "float" and the `min_temperature` below which the species will die
+        is optional.
+    """
+
+    DEATHS = ("sink", "float")
+
+    @classmethod
+    def load(cls, path, others=(), module=__name__):
+        """ Load and compile the species definitions held as a JSON list
+            within the file at the path provided.
+        """
+        with open(path) as f:
+            return cls(json.load(f), others, module)
+
+    def __init__(self, definitions, others=(), module=__name__):
+        self.names = []
+        self.energy = []
+        self.diet = []
+        self.reversal = []
+        self.upward = []
+        self.downward = []
+        self.sinks = []
+        self.min_temperature = []
+        self.sprites = []
+        self.classes = {}
+        diet_names = []
+        for index, definition in enumerate(definitions):
+            name = str(definition["name"])
+            if name in self.classes:
+                raise ValueError("Species {0} is defined more than once".format(name))
+            death = definition.get("death", "float")
+            if death not in SpeciesRegistry.DEATHS:
+                raise ValueError("Species {0} has unknown death behaviour {1!r}".format(name, death))
+            sprites = definition["sprites"]
+            self.names.append(name)
+            self.energy.append(int(definition["energy"]))
+            self.reversal.append(float(definition.get("reversal", 0.0)))
+            self.upward.append(float(definition.get("upward", 0.0)))
+            self.downward.append(float(definition.get("downward", 0.0)))
+            self.sinks.append(death == "sink")
+            self.min_temperature.append(float(definition.get("min_temperature", "-inf")))
+            # indexed by [alive][direction > 0]
+            self.sprites.append((
+                ([str(line) for line in sprites["west"]["dead"]],
+                 [str(line) for line in sprites["east"]["dead"]]),
+                ([str(line) for line in sprites["west"]["alive"]],
+                 [str(line) for line in sprites["east"]["alive"]]),
+            ))
+            diet_names.append(definition.get("diet", []))
+            self.classes[name] = type(name, (Species,), {
+                "__doc__": definition.get("description"),
+                "__module__": module,
+                "REGISTRY": self,
+                "SPECIES": index,
+                "ENERGY": self.energy[index],
+                "reversal": self.reversal[index],
+                "upward": self.upward[index],
+                "downward": self.downward[index],
+            })
+        known = dict((other.__name__, other) for other in others)
+        known.update(self.classes)
+        for name, names in zip(self.names, diet_names):
+            try:
+                self.diet.append(tuple(known[str(food)] for food in names))
+            except KeyError as error:
+                raise ValueError("Species {0} eats unknown food {1}".format(name, error.args[0]))
+
+    def __len__(self):
+        return len(self.names)
+
+    def species(self):
+        """ Return the compiled species classes in registry order.
+        """
+        return [self.classes[name] for name in self.names]
+
+    def index(self, name):
+        """ Return the table index of the named species.
+        """
+        return self.names.index(name)
+
+
 class ClockworkFish(Mobile, Tank.Item):
     """ ClockworkFish are Mobile but are not Animals. To that end, they swim
         around the tank like other fish but do not eat or breathe.
@@ -507,43 +1376,365 @@ class ClockworkFish(Mobile, Tank.Item):
         self.swim(tank)
 
 
-def main(screen):
-    """ The main game loop.
+SPECIES = SpeciesRegistry.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), "species.json"),
+                               others=[FishFood])
+Snail = SPECIES.classes["Snail"]
+SunFish = SPECIES.classes["SunFish"]
+DiverFish = SPECIES.classes["DiverFish"]
+PiranhaFish = SPECIES.classes["PiranhaFish"]
+
+
+def stock(tank):
+    """ Stock a demonstration tank with one creature of each species, each
+        placed at a random position.
     """
-    curses.curs_set(0)
-    curses.halfdelay(10)
-    tank = Tank(window=screen)
-    running = True
-    while running:
-        while True:
-            tank.draw()
-            ch = screen.getch()
-            if ch < 0:
+    for species in (SunFish, DiverFish, PiranhaFish, ClockworkFish, Snail):
+        tank.put(species(), y=random.randint(0, tank.height - 1))
+
+
+class RingBuffer(object):
+    """ A fixed number of the most recent values appended, held within a
+        preallocated array which is overwritten in a circular fashion.
+    """
+
+    def __init__(self, size, typecode="d"):
+        self.values = array.array(typecode, [0] * size)
+        self.size = size
+        self.end = 0
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        """ Iterate through the values held, from oldest to newest.
+        """
+        start = self.end - self.length
+        for i in range(start, self.end):
+            yield self.values[i % self.size]
+
+    def append(self, value):
+        self.values[self.end % self.size] = value
+        self.end = (self.end + 1) % self.size
+        if self.length < self.size:
+            self.length += 1
+
+    def last(self, count):
+        """ Return a list of up to `count` of the newest values held.
+        """
+        count = min(count, self.length)
+        return [self.values[(self.end - count + i) % self.size] for i in range(count)]
+
+
+class History(object):
+    """ A bounded record of a single metric over an indefinite number of
+        turns, kept at several resolutions. Level zero holds the value for
+        each of the most recent turns; each level above holds minimum, mean
+        and maximum values for buckets of turns `factor` times wider than
+        those of the level below. Every level is a set of ring buffers of the
+        same size, so memory use is fixed however long the run.
+    """
+
+    def __init__(self, size=256, factor=16, levels=4):
+        self.size = size
+        self.factor = factor
+        self.recent = RingBuffer(size)
+        # for each level above zero: (minimum, mean, maximum) rings
+        self.buckets = [(RingBuffer(size), RingBuffer(size), RingBuffer(size))
+                        for level in range(1, levels)]
+        # for each level above zero: [count, minimum, total, maximum] of the
+        # bucket currently being filled
+        self._partial = [[0, 0.0, 0.0, 0.0] for level in range(1, levels)]
+
+    def span(self, level):
+        """ Return the number of turns covered by each value at a level.
+        """
+        return self.factor ** level
+
+    def append(self, value):
+        self.recent.append(value)
+        self._merge(0, 1, value, value, value)
+
+    def _merge(self, level, count, minimum, total, maximum):
+        """ Merge an aggregate of `count` turns into the partial bucket at
+            the level above `level`, completing it if it is full.
+        """
+        if level == len(self._partial):
+            return
+        partial = self._partial[level]
+        if partial[0] == 0:
+            partial[1], partial[3] = minimum, maximum
+        else:
+            partial[1] = min(partial[1], minimum)
+            partial[3] = max(partial[3], maximum)
+        partial[0] += count
+        partial[2] += total
+        if partial[0] == self.span(level + 1):
+            count, minimum, total, maximum = partial
+            low, mean, high = self.buckets[level]
+            low.append(minimum)
+            mean.append(total / count)
+            high.append(maximum)
+            partial[:] = [0, 0.0, 0.0, 0.0]
+            self._merge(level + 1, count, minimum, total, maximum)
+
+    def series(self, level=0):
+        """ Return the values held at a level, oldest first. At level zero
+            these are the values of individual turns; above that they are
+            (minimum, mean, maximum) tuples for each bucket of turns.
+        """
+        if level == 0:
+            return list(self.recent)
+        low, mean, high = self.buckets[level - 1]
+        return list(zip(low, mean, high))
+
+    def summary(self):
+        """ Return the (minimum, mean, maximum) over the longest span of turns
+            recorded, or None if nothing has been recorded.
+        """
+        for level in range(len(self.buckets), 0, -1):
+            if len(self.buckets[level - 1][0]):
+                buckets = self.series(level)
+                return (min(low for low, _, _ in buckets),
+                        sum(mean for _, mean, _ in buckets) / len(buckets),
+                        max(high for _, _, high in buckets))
+        values = self.series(0)
+        if not values:
+            return None
+        return min(values), sum(values) / len(values), max(values)
+
+
+class PopulationHistory(object):
+    """ Records the number of living creatures of each species, the total
+        energy of all living animals and the tank temperature every turn,
+        each as a `History`. Once assigned to `Tank.history`, a record is
+        taken at the end of each turn.
+    """
+
+    SPARKS = " .:-=+*#%@"
+
+    def __init__(self, species=None, size=256, factor=16, levels=4):
+        if species is None:
+            species = SPECIES.names + ["ClockworkFish", "FishFood"]
+        self.species = list(species)
+        self.metrics = self.species + ["energy", "temperature"]
+        self.history = dict((metric, History(size, factor, levels)) for metric in self.metrics)
+        self.turns = 0
+
+    def __getitem__(self, metric):
+        return self.history[metric]
+
+    def record(self, tank):
+        counts = dict.fromkeys(self.species, 0)
+        energy = 0
+        for item in tank:
+            if isinstance(item, Animal):
+                if not item.alive:
+                    continue
+                energy += item.energy * item.count
+            name = type(item).__name__
+            if name in counts:
+                counts[name] += item.count
+        for name, count in counts.items():
+            self.history[name].append(count)
+        self.history["energy"].append(energy)
+        self.history["temperature"].append(tank.temperature())
+        self.turns += 1
+
+    def report(self, width=40):
+        """ Return a list of lines of text summarising the history of each
+            metric, giving a sparkline of the most recent turns alongside the
+            minimum, mean and maximum over the longest span recorded.
+        """
+        lines = ["history of {0} turns: recent turns, then min/mean/max".format(self.turns)]
+        for metric in self.metrics:
+            history = self.history[metric]
+            recent = history.recent.last(width)
+            summary = history.summary()
+            if summary is None:
+                continue
+            low, high = min(recent), max(recent)
+            scale = (len(self.SPARKS) - 1) / (high - low) if high > low else 0
+            spark = "".join(self.SPARKS[int((value - low) * scale)] for value in recent)
+            lines.append("{0:<13} {1:<{2}} {3:.1f}/{4:.1f}/{5:.1f}".format(metric, spark, width, *summary))
+        return lines
+
+
+class Event(object):
+    """ An action scheduled within a `TimingWheel`, due at turn `due` and
+        repeating every `period` turns if a period is given. The `sequence`
+        number orders events by when they were last scheduled.
+    """
+
+    def __init__(self, due, action, period=None, sequence=0):
+        self.due = due
+        self.action = action
+        self.period = period
+        self.sequence = sequence
+        self.cancelled = False
+
+    def cancel(self):
+        """ Cancel this event, along with any repeats. The event is discarded
+            when its slot is next reached rather than searched for now.
+        """
+        self.cancelled = True
+
+
+class TimingWheel(object):
+    """ A hierarchical timing wheel, holding events due at future turns. Each
+        of the `levels` wheels has 2 ** `bits` slots, each slot of a wheel
+        spanning a whole turn of the wheel below it. An event is placed in
+        the slot of the lowest wheel able to reach its due turn and, as each
+        higher slot comes round, its events are moved down to finer wheels.
+        Scheduling, cancelling and advancing by a turn therefore cost O(1)
+        regardless of how many events are pending, with each event moved at
+        most once per level. Events due beyond the reach of the top wheel
+        wait in its furthest slot, from which they are placed again each time
+        it comes round until they come within reach.
+    """
+
+    def __init__(self, levels=4, bits=6):
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.wheels = [[[] for slot in range(1 << bits)] for level in range(levels)]
+        self.now = 0
+        self.scheduled = 0
+
+    def schedule(self, delay, action, period=None):
+        """ Schedule an action due in `delay` turns, at least one, and then
+            every `period` turns if provided. Return the `Event` created.
+        """
+        if delay < 1 or (period is not None and period < 1):
+            raise ValueError("Events must be scheduled at least one turn ahead")
+        event = Event(self.now + delay, action, period, self.scheduled)
+        self.scheduled += 1
+        self._insert(event)
+        return event
+
+    def _insert(self, event):
+        delay = event.due - self.now
+        if delay <= 0:
+            # moved down from a higher wheel on the turn it is due
+            self.wheels[0][self.now & self.mask].append(event)
+            return
+        for level, wheel in enumerate(self.wheels):
+            if delay < 1 << (self.bits * (level + 1)):
+                wheel[(event.due >> (self.bits * level)) & self.mask].append(event)
+                return
+        level = len(self.wheels) - 1
+        self.wheels[level][((self.now >> (self.bits * level)) - 1) & self.mask].append(event)
+
+    def advance(self):
+        """ Advance by a single turn and return the events which fall due,
+            in the order in which they were scheduled. Events moved down from
+            higher wheels join a slot after those placed in it directly, so
+            the events due are sorted by their sequence numbers. Repeating
+            events are scheduled again before they are returned.
+        """
+        self.now += 1
+        for level in range(1, len(self.wheels)):
+            if self.now & ((1 << (self.bits * level)) - 1):
                 break
-            elif ch == ord('s'):
-                tank.put(SunFish())
-            elif ch == ord('d'):
-                tank.put(DiverFish())
-            elif ch == ord('p'):
-                tank.put(PiranhaFish())
-            elif ch == ord('c'):
-                tank.put(ClockworkFish())
-            elif ch == ord('z'):
-                tank.put(Snail())
-            elif ch == ord('f'):
-                tank.put(FishFood())
-            elif ch == ord('['):
-                tank.cool()
-            elif ch == ord(']'):
-                tank.warm()
-            elif ch == ord('r'):
-                tank.remove_dead()
-            elif ch == ord('e'):
-                tank.empty()
-            elif ch == ord('q'):
-                running = False
-        if running:
-            tank.turn()
+            slot = self.wheels[level][(self.now >> (self.bits * level)) & self.mask]
+            events = slot[:]
+            del slot[:]
+            for event in events:
+                if not event.cancelled:
+                    self._insert(event)
+        slot = self.wheels[0][self.now & self.mask]
+        events = [event for event in slot if not event.cancelled]
+        del slot[:]
+        # with a single wheel, events beyond its reach come round early
+        due = []
+        for event in events:
+            if event.due > self.now:
+                self._insert(event)
+            else:
+                due.append(event)
+        due.sort(key=lambda event: event.sequence)
+        for event in due:
+            if event.period is not None:
+                event.due = self.now + event.period
+                event.sequence = self.scheduled
+                self.scheduled += 1
+                self._insert(event)
+        return due
+
+    def copy(self):
+        """ Return an independent copy of this wheel and its pending events.
+        """
+        wheel = copy.copy(self)
+        copies = {}
+        wheel.wheels = [[[copies.setdefault(id(event), copy.copy(event)) for event in slot]
+                         for slot in slots] for slots in self.wheels]
+        return wheel
+
+
+class EventBus(object):
+    """ Collects the events of a tank and delivers them to subscribers in
+        batches. Each event is a tuple of its topic followed by its details:
+
+            ("put", item, x, y)         a new item is put into the tank
+            ("move", item, x, y)        an item moves within the tank
+            ("remove", item)            an item is removed from the tank
+            ("eat", diner, food, energy)
+                                        an animal eats, gaining energy
+            ("kill", animal)            an animal dies during its turn
+            ("remove_dead", animals)    the dead animals listed are removed
+            ("empty",)                  the tank is emptied
+            ("warm", temperature)       the tank warms to the temperature
+            ("cool", temperature)       the tank cools to the temperature
+
+        Only events of topics with subscribers are kept at all, and a tank
+        without subscribers has no bus, so unobserved tanks pay for nothing
+        more than a check of their `events` attribute.
+    """
+
+    TOPICS = ("put", "move", "remove", "eat", "kill", "remove_dead", "empty", "warm", "cool")
+
+    def __init__(self):
+        self.subscriptions = []
+        self.topics = frozenset()
+        self.pending = []
+
+    def subscribe(self, callback, topics=None):
+        """ Subscribe a callback, taking a list of events, to the topics
+            listed, or to every topic. Return the subscription.
+        """
+        topics = frozenset(self.TOPICS if topics is None else topics)
+        unknown = topics.difference(self.TOPICS)
+        if unknown:
+            raise ValueError("Unknown topics: {0}".format(", ".join(sorted(unknown))))
+        subscription = (callback, topics)
+        self.subscriptions.append(subscription)
+        self.topics = self.topics.union(topics)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.remove(subscription)
+        self.topics = frozenset().union(*[topics for callback, topics in self.subscriptions])
+
+    def emit(self, topic, *details):
+        if topic in self.topics:
+            self.pending.append((topic,) + details)
+
+    def flush(self):
+        """ Deliver the events collected since the last flush, in the order
+            in which they occurred, to each subscriber with an interest.
+        """
+        if not self.pending:
+            return
+        events, self.pending = self.pending, []
+        for callback, topics in self.subscriptions:
+            if topics.issuperset(self.topics):
+                batch = events
+            else:
+                batch = [event for event in events if event[0] in topics]
+            if batch:
+                callback(batch)
+
 
 if __name__ == "__main__":
-    curses.wrapper(main)
+    # the curses front end is only imported when the game is to be played
+    import simfish_curses
+    simfish_curses.play()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Lockstep simulation of many small fish tanks
+
+    A `BatchTank` holds a batch of independent tanks as a set of NumPy arrays
+    with a leading tank axis, so that a single call to `turn` advances every
+    tank in the batch at once. This suits ensemble jobs running thousands of
+    small tanks, for which the cost of `Tank` objects, each item a Python
+    object taking its turn in turn, would otherwise dominate.
+
+    Each tank holds a fixed number of slots, each either empty or holding a
+    single individual: a member of one of the species of a `SpeciesRegistry`
+    or a portion of FishFood. Within a turn, meals are settled first, then
+    every individual moves, then the temperature of each tank drifts, all
+    following the rules of `Tank.turn`. Since the tanks advance together,
+    the random numbers are drawn in a different order to a `Tank`, so a
+    batch is statistically equivalent to the same tanks run one by one
+    rather than identical to them. Within a cell, the animals of each
+    species take their meals in the order of the species in the registry.
+"""
+
+import numpy
+
+import simfish
+
+# the kind of an empty slot
+EMPTY = -1
+
+
+def _ranks(keys):
+    """ Return the rank of each key among the keys equal to it, in order of
+        position, so that the first occurrence of each key has rank 0.
+    """
+    order = numpy.argsort(keys, kind="mergesort")
+    ordered = keys[order]
+    starts = numpy.ones(len(keys), dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    positions = numpy.arange(len(keys))
+    first = numpy.maximum.accumulate(numpy.where(starts, positions, 0))
+    ranks = numpy.empty(len(keys), dtype=numpy.intp)
+    ranks[order] = positions - first
+    return ranks
+
+
+class BatchTank(object):
+    """ A batch of `size` tanks of identical dimensions, advanced together.
+        The state of the batch is held in arrays indexed by [tank, slot]:
+        `kind` (the registry index of a species, `food` for FishFood or
+        EMPTY), `x`, `y`, `direction` and `energy`. The temperature of each
+        tank is held in `temperature`, indexed by tank.
+    """
+
+    def __init__(self, size, capacity=256, temperature=17.0, width=simfish.TANK_WIDTH,
+                 height=simfish.TANK_HEIGHT, registry=None, seed=None):
+        """ Create a batch of empty tanks, each with room for `capacity`
+            individuals. Random numbers are drawn from a generator of the
+            batch's own, seeded with `seed` if provided.
+        """
+        self.registry = registry or simfish.SPECIES
+        self.size = size
+        self.capacity = capacity
+        self.width = width
+        self.height = height
+        self.random = numpy.random.RandomState(seed)
+        self.temperature = numpy.empty(size)
+        self.temperature[:] = 17.0 if temperature is None else temperature
+        self.kind = numpy.full((size, capacity), EMPTY, dtype=numpy.int8)
+        self.x = numpy.zeros((size, capacity), dtype=numpy.int16)
+        self.y = numpy.zeros((size, capacity), dtype=numpy.int16)
+        self.direction = numpy.zeros((size, capacity), dtype=numpy.int8)
+        self.energy = numpy.zeros((size, capacity), dtype=int)
+        # the tables of the registry, extended by one kind for FishFood
+        self.food = len(self.registry)
+        kinds = self.registry.species() + [simfish.FishFood]
+        self.names = [kind.__name__ for kind in kinds]
+        self.initial_energy = numpy.array(self.registry.energy + [simfish.FishFood().energy])
+        self.reversal = numpy.array(self.registry.reversal + [0.0])
+        self.upward = numpy.array(self.registry.upward + [0.0])
+        self.downward = numpy.array(self.registry.downward + [0.0])
+        self.sinks = numpy.array(self.registry.sinks + [True])
+        self.min_temperature = numpy.array(self.registry.min_temperature + [float("-inf")])
+        # edible[i][j] is true if kind i will eat kind j
+        self.edible = numpy.array([[issubclass(prey, diet) for prey in kinds]
+                                   for diet in self.registry.diet] + [[False] * len(kinds)])
+
+    def __len__(self):
+        """ Return the number of individuals held across the whole batch.
+        """
+        return int(numpy.count_nonzero(self.kind != EMPTY))
+
+    def put(self, name, x=None, y=None, direction=None, tanks=None):
+        """ Place an individual of the named species, or a portion of
+            FishFood, into each of the tanks selected by `tanks` (an index,
+            a slice or a boolean mask, selecting all tanks by default). As
+            with `Tank.put`, an individual is placed at a random horizontal
+            position at the top of the tank unless `x` and `y` are provided,
+            and swims in a random direction unless `direction` is provided.
+        """
+        selected = numpy.arange(self.size)[slice(None) if tanks is None else tanks]
+        selected = numpy.atleast_1d(selected)
+        free = self.kind[selected] == EMPTY
+        if not free.any(axis=1).all():
+            raise ValueError("No room for {0} in a full tank".format(name))
+        slots = free.argmax(axis=1)
+        kind = self.names.index(name)
+        count = len(selected)
+        if x is None:
+            x = self.random.randint(0, self.width, count)
+        if direction is None:
+            direction = self.random.choice([simfish.EAST, simfish.WEST], count)
+        self.kind[selected, slots] = kind
+        self.x[selected, slots] = x
+        self.y[selected, slots] = 0 if y is None else y
+        self.direction[selected, slots] = direction if kind != self.food else 0
+        self.energy[selected, slots] = self.initial_energy[kind]
+
+    def feed(self):
+        """ Settle all meals for the current turn. Every hungry animal eats at
+            most one edible individual from its cell, each individual being
+            eaten at most once, and eaten individuals leave their tanks.
+        """
+        occupied = self.kind != EMPTY
+        tanks, slots = numpy.nonzero(occupied)
+        kinds = self.kind[tanks, slots].astype(numpy.intp)
+        cells = (tanks * self.height + self.y[tanks, slots]) * self.width + self.x[tanks, slots]
+        energy = self.energy[tanks, slots]
+        warm = self.temperature[tanks] >= self.min_temperature[kinds]
+        available = numpy.ones(len(kinds), dtype=bool)
+        for diner in range(len(self.registry)):
+            diners = numpy.flatnonzero((kinds == diner) & (energy != 0) & warm & available)
+            if not len(diners):
+                continue
+            foods = numpy.flatnonzero(self.edible[diner][kinds] & available)
+            if not len(foods):
+                continue
+            # the diner of each rank within its cell eats the food of the
+            # same rank within that cell, if there is one
+            food_keys = cells[foods] * self.capacity + _ranks(cells[foods])
+            diner_keys = cells[diners] * self.capacity + _ranks(cells[diners])
+            order = numpy.argsort(food_keys)
+            found = numpy.searchsorted(food_keys[order], diner_keys)
+            found[found == len(foods)] = 0
+            meals = (food_keys[order][found] == diner_keys) & (foods[order][found] != diners)
+            eaten = foods[order][found[meals]]
+            energy[diners[meals]] += energy[eaten]
+            available[eaten] = False
+        self.energy[tanks, slots] = energy
+        eaten = ~available
+        self.kind[tanks[eaten], slots[eaten]] = EMPTY
+
+    def turn(self):
+        """ Advance every tank in the batch by a single turn.
+        """
+        self.feed()
+        kind = self.kind.astype(numpy.intp)
+        occupied = kind != EMPTY
+        food = kind == self.food
+        animal = occupied & ~food
+        alive = animal & (self.energy != 0)
+        cold = alive & (self.temperature[:, numpy.newaxis] < self.min_temperature[kind])
+        self.energy[cold] = 0
+        swimming = alive & ~cold
+        self.energy[swimming] -= 1
+        # the dead and FishFood sink or float, stopping at the edge
+        drifting = occupied & ~alive
+        dy = numpy.where(self.sinks[kind], 1, -1)
+        y = self.y + dy
+        drifting &= (y >= 0) & (y < self.height)
+        self.y[drifting] = y[drifting]
+        # swimmers change course, reversing upon reaching the edge
+        reverse = self.random.random_sample(kind.shape) < self.reversal[kind]
+        n = self.random.random_sample(kind.shape)
+        dy = numpy.where(n < self.upward[kind], -1, numpy.where(n >= 1.0 - self.downward[kind], 1, 0))
+        x = self.x + self.direction
+        y = self.y + dy
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        moving = swimming & ~reverse & inside
+        self.x[moving] = x[moving]
+        self.y[moving] = y[moving]
+        reversing = swimming & (reverse | ~inside)
+        self.direction[reversing] = -self.direction[reversing]
+        # the temperature drifts as within `Tank.turn`
+        n = self.random.random_sample(self.size)
+        warm = self.temperature > 15.0
+        cool_below = numpy.where(warm, 0.3, 0.2)
+        warm_above = numpy.where(warm, 0.8, 0.7)
+        self.temperature[n < cool_below] -= 0.1
+        self.temperature[n >= warm_above] += 0.1
+
+    def counts(self):
+        """ Return an array indexed by [tank, kind] of the number of living
+            individuals of each kind, with FishFood in the last column.
+        """
+        kind = self.kind.astype(numpy.intp)
+        living = (kind != EMPTY) & ((kind == self.food) | (self.energy != 0))
+        counts = numpy.zeros((self.size, len(self.names)), dtype=numpy.intp)
+        tanks = numpy.nonzero(living)[0]
+        numpy.add.at(counts, (tanks, kind[living]), 1)
+        return counts
+
+    def tank(self, index):
+        """ Return a new `Tank` holding a copy of the tank of the batch at the
+            index provided, for example to render it.
+        """
+        tank = simfish.Tank(temperature=float(self.temperature[index]), width=self.width, height=self.height)
+        for slot in numpy.flatnonzero(self.kind[index] != EMPTY):
+            kind = int(self.kind[index, slot])
+            if kind == self.food:
+                item = simfish.FishFood(energy=int(self.energy[index, slot]))
+            else:
+                item = self.registry.species()[kind](direction=int(self.direction[index, slot]))
+                item.energy = int(self.energy[index, slot])
+            tank.put(item, x=int(self.x[index, slot]), y=int(self.y[index, slot]))
+        return tank
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Curses front end for the fish tank simulator
+"""
+
+import curses
+import random
+import sys
+import threading
+import time
+
+from simfish import (Tank, Viewport, PopulationHistory, FrameBuffer, SunFish, DiverFish,
+                     PiranhaFish, ClockworkFish, Snail, FishFood, EAST, WEST, TANK_WIDTH, TANK_HEIGHT)
+
+# the time allowed for key presses between turns, in milliseconds
+TURN_TIME = 1000
+
+# the interval at which key presses are polled for while another thread draws
+# the screen, in milliseconds
+POLL_TIME = 20
+
+# the keys which add items to the tank, with the kind of item each adds
+ITEMS = {
+    ord('s'): SunFish,
+    ord('d'): DiverFish,
+    ord('p'): PiranhaFish,
+    ord('c'): ClockworkFish,
+    ord('z'): Snail,
+    ord('f'): FishFood,
+}
+
+# the keys which change the temperature, with the steps by which each does
+TEMPERATURE = {
+    ord('['): -1,
+    ord(']'): +1,
+}
+
+# the keys which scroll the view of the tank, with the direction of each
+SCROLL = {
+    curses.KEY_LEFT: (-1, 0),
+    curses.KEY_RIGHT: (1, 0),
+    curses.KEY_UP: (0, -1),
+    curses.KEY_DOWN: (0, 1),
+}
+
+# the largest minimap of the tank, in characters
+MINIMAP_COLUMNS = 60
+MINIMAP_ROWS = 8
+
+
+def read_keys(screen, lock=None):
+    """ Wait for a key press, for up to `TURN_TIME`, then return a list of it
+        and of every other key press already waiting, such as those from a
+        held key or a paste. An empty list means that no key was pressed.
+        If a lock is provided, the screen is shared with another thread, so
+        it is instead polled every `POLL_TIME`, holding the lock only while
+        reading the keys already waiting.
+    """
+    if lock is not None:
+        deadline = time.time() + TURN_TIME / 1000.0
+        while True:
+            with lock:
+                keys = _drain(screen)
+            if keys or time.time() >= deadline:
+                return keys
+            time.sleep(POLL_TIME / 1000.0)
+    ch = screen.getch()
+    if ch < 0:
+        return []
+    return [ch] + _drain(screen)
+
+
+def _drain(screen):
+    """ Return a list of the key presses already waiting, without waiting.
+    """
+    keys = []
+    screen.timeout(0)
+    try:
+        while True:
+            ch = screen.getch()
+            if ch < 0:
+                break
+            keys.append(ch)
+    finally:
+        screen.timeout(TURN_TIME)
+    return keys
+
+
+def coalesce(keys):
+    """ Fold a burst of key presses into a list of (key, count) commands, in
+        which each run of presses of the same key becomes a single command.
+        Each run of presses of the temperature keys becomes a single command
+        for the net number of steps, keyed by `]` and negative if cooling.
+    """
+    commands = []
+    for ch in keys:
+        if ch in TEMPERATURE:
+            ch, count = ord(']'), TEMPERATURE[ch]
+        else:
+            count = 1
+        if commands and commands[-1][0] == ch:
+            commands[-1] = (ch, commands[-1][1] + count)
+        else:
+            commands.append((ch, count))
+    return commands
+
+
+def drop(tank, kind, count):
+    """ Add `count` items of the kind provided to the tank, each placed as if
+        added alone at a random position along the top of the tank. Items
+        which stack, such as fish and food, are put in as one stack for each
+        position and direction, so that a large drop costs only as many
+        `put` calls as there are places for it to land.
+    """
+    if not kind.stackable:
+        for i in range(count):
+            tank.put(kind())
+        return
+    school = hasattr(kind, "school")
+    groups = {}
+    for i in range(count):
+        place = (random.randint(0, tank.width - 1), random.choice([EAST, WEST]) if school else None)
+        groups[place] = groups.get(place, 0) + 1
+    for (x, direction), size in groups.items():
+        tank.put(kind.school(size, direction) if school else kind.stack(size), x=x)
+
+
+class Renderer(object):
+    """ Draws frames of a tank to a curses window on a thread of its own, so
+        that the simulation never waits upon the terminal. The simulation
+        composes each frame into the back buffer with `publish`, while the
+        thread draws the front buffer, the two being swapped once the thread
+        is ready for the next frame. A frame published before the last has
+        been taken up replaces it, so a slow terminal shows only the latest
+        frame, and `drawn` and `dropped` count the frames each way. Every
+        curses call on the window, from either thread, should be made while
+        holding `lock`.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.lock = threading.Lock()
+        self.drawn = 0
+        self.dropped = 0
+        self._condition = threading.Condition()
+        self._front = None
+        self._back = None
+        self._footer = ()
+        self._erase = False
+        self._ready = False
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """ Start the thread which draws the frames.
+        """
+        self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stop the thread once it has drawn any frame still waiting.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+
+    def publish(self, tank, footer=(), erase=False):
+        """ Compose the tank into the back buffer, along with the lines of
+            `footer` text to show below it, ready to be drawn. If `erase` is
+            set, the window is erased before the frame is drawn.
+        """
+        with self._condition:
+            if self._ready:
+                self.dropped += 1
+            size = tank.frame_size()
+            if self._back is None or self._back.size != size:
+                self._back = FrameBuffer(*size)
+            tank.compose(self._back)
+            self._footer = tuple(footer)
+            self._erase = self._erase or erase
+            self._ready = True
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._ready:
+                    self._condition.wait()
+                if not self._ready:
+                    return
+                self._front, self._back = self._back, self._front
+                footer, erase = self._footer, self._erase
+                self._erase = self._ready = False
+            with self.lock:
+                if erase:
+                    self.window.erase()
+                self._front.blit(self.window, footer)
+                self.window.refresh()
+            self.drawn += 1
+
+
+def main(screen, width=TANK_WIDTH, height=TANK_HEIGHT, threaded=False):
+    """ The main game loop. The tank is drawn once for every burst of key
+        presses, which are handled together as a batch of commands. A tank
+        too large for the terminal is shown through a viewport, which the
+        arrow keys scroll. If `threaded` is set, the tank is drawn by a
+        `Renderer` on a thread of its own.
+    """
+    curses.curs_set(0)
+    screen.timeout(TURN_TIME)
+    tank = Tank(window=screen, width=width, height=height)
+    tank.history = PopulationHistory()
+    tank.viewport = Viewport()
+    renderer = None
+    if threaded:
+        renderer = Renderer(screen)
+        renderer.start()
+    try:
+        run(screen, tank, renderer)
+    finally:
+        if renderer is not None:
+            renderer.stop()
+
+
+def run(screen, tank, renderer=None):
+    """ Run the game loop for the tank provided until the Q key is pressed,
+        drawing through the `Renderer` provided, if any.
+    """
+    lock = renderer.lock if renderer is not None else None
+    show_history = False
+    show_minimap = False
+    erase = False
+    feeder = None
+    running = True
+    while running:
+        while running:
+            footer = []
+            if show_minimap:
+                footer.extend(tank.minimap(MINIMAP_COLUMNS, MINIMAP_ROWS))
+            if show_history:
+                footer.extend(tank.history.report())
+            size = (tank.viewport.width, tank.viewport.height)
+            if lock is None:
+                rows, columns = screen.getmaxyx()
+            else:
+                with lock:
+                    rows, columns = screen.getmaxyx()
+            tank.viewport.fit(tank, columns, rows - len(footer) - 1)
+            erase = erase or size != (tank.viewport.width, tank.viewport.height)
+            if renderer is not None:
+                renderer.publish(tank, footer, erase)
+            else:
+                if erase:
+                    screen.erase()
+                tank.draw(footer)
+            erase = False
+            keys = read_keys(screen, lock)
+            if not keys:
+                break
+            for ch, count in coalesce(keys):
+                if ch in ITEMS:
+                    drop(tank, ITEMS[ch], count)
+                elif ch == ord(']'):
+                    if count > 0:
+                        tank.warm(count)
+                    elif count < 0:
+                        tank.cool(-count)
+                elif ch in SCROLL:
+                    dx, dy = SCROLL[ch]
+                    tank.viewport.scroll(tank, dx * count, dy * count)
+                elif ch == ord('r'):
+                    tank.remove_dead()
+                elif ch == ord('e'):
+                    tank.empty()
+                elif ch == ord('a') and count % 2:
+                    if feeder is None:
+                        feeder = tank.schedule(5, lambda tank: tank.put(FishFood()), period=5)
+                    else:
+                        feeder.cancel()
+                        feeder = None
+                elif ch == ord('h') and count % 2:
+                    show_history = not show_history
+                    erase = True
+                elif ch == ord('m') and count % 2:
+                    show_minimap = not show_minimap
+                    erase = True
+                elif ch == ord('q'):
+                    running = False
+                    break
+        if running:
+            tank.turn()
+
+
+def play(width=TANK_WIDTH, height=TANK_HEIGHT, threaded=False):
+    """ Play the game within the terminal, with a tank of the size provided,
+        drawing it on a thread of its own if `threaded` is set.
+    """
+    curses.wrapper(main, width, height, threaded)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    threaded = "--threaded" in args
+    play(*[int(arg) for arg in args if arg != "--threaded"][:2], threaded=threaded)
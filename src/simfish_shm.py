@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Shared-memory publishing of live tank state
+
+    A `TankPublisher` writes the state of a tank into a named shared memory
+    segment once per turn, from which any number of `TankReader` objects in
+    other local processes may read it, without the simulation copying any
+    data over pipes or waiting for them. Readers and the writer are kept
+    apart by a seqlock: the writer makes the sequence number odd before
+    changing the segment and even again once done, so a reader which sees
+    the same even sequence number before and after copying the segment
+    knows that its copy is consistent, and otherwise simply tries again.
+    The writer changes the sequence number alone, never in the same write
+    as the rest of the header, so that it is only made even once every
+    other field holds its new value.
+
+    The segment begins with a header, packed as little-endian:
+
+        sequence     unsigned 64-bit seqlock sequence number
+        temperature  double, the tank temperature
+        width        unsigned 32-bit width of the tank in cells
+        height       unsigned 32-bit height of the tank in cells
+        capacity     unsigned 32-bit number of records the segment can hold
+        records      unsigned 32-bit number of records published
+        population   unsigned 32-bit number of individuals in the tank
+        names        unsigned 32-bit length of the list of kinds
+
+    The header is followed by a list of the names of the kinds of item
+    published, encoded as a JSON list within NAMES_SIZE bytes, and then by
+    one record for each item within the tank:
+
+        x, y         signed 16-bit location of the item
+        kind         unsigned 8-bit index into the list of kinds
+        direction    signed 8-bit direction of a mobile item, otherwise 0
+        count        unsigned 32-bit number of individuals in the item
+        energy       double, the energy held by an organic item, otherwise 0
+
+    Shared memory needs Python 3.8 or above.
+"""
+
+import json
+import struct
+import sys
+import time
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+import simfish
+
+SEQUENCE = struct.Struct("<Q")
+HEADER = struct.Struct("<QdIIIIII")
+# the header after the sequence number, which is written separately
+FIELDS = struct.Struct("<dIIIIII")
+RECORD = struct.Struct("<hhBbId")
+
+# the space reserved for the list of kinds of item
+NAMES_SIZE = 1024
+
+# the NumPy dtype of a record, for reading records as an array
+DTYPE = [("x", "<i2"), ("y", "<i2"), ("kind", "u1"), ("direction", "i1"),
+         ("count", "<u4"), ("energy", "<f8")]
+
+
+# the names of the segments published by this process
+_published = set()
+
+
+def _require_shared_memory():
+    if shared_memory is None:
+        raise RuntimeError("Shared memory needs Python 3.8 or above")
+
+
+class Snapshot(object):
+    """ A consistent copy of the tank state published at one moment. The
+        records are held as bytes, which may be read as a NumPy array
+        without a further copy by `array`.
+    """
+
+    def __init__(self, version, temperature, width, height, population, names, records):
+        self.version = version
+        self.temperature = temperature
+        self.width = width
+        self.height = height
+        self.population = population
+        self.names = names
+        self.records = records
+
+    def __len__(self):
+        return len(self.records) // RECORD.size
+
+    def items(self):
+        """ Return a list of (name, x, y, direction, count, energy) tuples,
+            one for each item published.
+        """
+        items = []
+        for offset in range(0, len(self.records), RECORD.size):
+            x, y, kind, direction, count, energy = RECORD.unpack_from(self.records, offset)
+            items.append((self.names[kind], x, y, direction, count, energy))
+        return items
+
+    def array(self):
+        """ Return the records as a NumPy structured array of DTYPE.
+        """
+        import numpy
+        return numpy.frombuffer(self.records, dtype=DTYPE)
+
+    def counts(self):
+        """ Return a dictionary of the number of individuals of each kind.
+        """
+        counts = dict.fromkeys(self.names, 0)
+        for name, x, y, direction, count, energy in self.items():
+            counts[name] += count
+        return counts
+
+
+class TankPublisher(object):
+    """ Publishes the state of a tank into a new shared memory segment, named
+        `name` or given a unique name if none is provided, with room for
+        `capacity` items. If a tank holds more items than that, only the
+        first `capacity` are published, although `population` still counts
+        every individual.
+    """
+
+    def __init__(self, name=None, capacity=1024):
+        _require_shared_memory()
+        self.capacity = capacity
+        size = HEADER.size + NAMES_SIZE + capacity * RECORD.size
+        self.memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self.memory.name
+        _published.add(self.name)
+        self.buffer = self.memory.buf
+        self.sequence = 0
+        self.kinds = {}
+        self.names = []
+        self.names_size = 0
+        HEADER.pack_into(self.buffer, 0, 0, 0.0, 0, 0, capacity, 0, 0, 0)
+
+    def close(self):
+        """ Release and remove the shared memory segment.
+        """
+        self.buffer = None
+        self.memory.close()
+        self.memory.unlink()
+        _published.discard(self.name)
+
+    def _kind(self, item):
+        cls = type(item)
+        kind = self.kinds.get(cls)
+        if kind is None:
+            kind = self.kinds[cls] = len(self.names)
+            self.names.append(cls.__name__)
+        return kind
+
+    def publish(self, tank):
+        """ Publish the current state of the tank provided.
+        """
+        buffer = self.buffer
+        known = len(self.names)
+        self.sequence += 1
+        SEQUENCE.pack_into(buffer, 0, self.sequence)
+        offset = HEADER.size + NAMES_SIZE
+        end = offset + self.capacity * RECORD.size
+        records = population = 0
+        for (x, y), items in tank.cells():
+            for item in items:
+                population += item.count
+                if offset < end:
+                    RECORD.pack_into(buffer, offset, x, y, self._kind(item), getattr(item, "direction", 0),
+                                     item.count, getattr(item, "energy", 0))
+                    offset += RECORD.size
+                    records += 1
+        if len(self.names) > known or not self.names_size:
+            names = json.dumps(self.names).encode("ascii")
+            if len(names) > NAMES_SIZE:
+                raise ValueError("Too many kinds of item to publish")
+            buffer[HEADER.size:HEADER.size + len(names)] = names
+            self.names_size = len(names)
+        FIELDS.pack_into(buffer, SEQUENCE.size, tank.temperature(), tank.width, tank.height,
+                         self.capacity, records, population, self.names_size)
+        self.sequence += 1
+        SEQUENCE.pack_into(buffer, 0, self.sequence)
+
+
+class TankReader(object):
+    """ Reads the tank state published into the shared memory segment of the
+        name provided.
+    """
+
+    def __init__(self, name):
+        _require_shared_memory()
+        self.memory = shared_memory.SharedMemory(name=name)
+        if name not in _published:
+            # only the publisher should remove the segment, so stop this
+            # process removing it at exit
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self.memory._name, "shared_memory")
+            except (ImportError, AttributeError):
+                pass
+        self.buffer = self.memory.buf
+        self._names = (None, None)
+
+    def close(self):
+        self.buffer = None
+        self.memory.close()
+
+    def snapshot(self, timeout=1.0):
+        """ Return a consistent `Snapshot` of the state most recently
+            published, or None if nothing has yet been published. If the
+            state is being published, wait for it to be finished, raising
+            IOError if no consistent copy can be made within `timeout`
+            seconds.
+        """
+        buffer = self.buffer
+        deadline = time.time() + timeout
+        while True:
+            (before,) = SEQUENCE.unpack_from(buffer, 0)
+            if not before % 2:
+                header = HEADER.unpack_from(buffer, 0)
+                sequence, temperature, width, height, capacity, records, population, size = header
+                start = HEADER.size + NAMES_SIZE
+                names = bytes(buffer[HEADER.size:HEADER.size + size])
+                data = bytes(buffer[start:start + records * RECORD.size])
+                (after,) = SEQUENCE.unpack_from(buffer, 0)
+                if after == before == sequence:
+                    if not sequence:
+                        return None
+                    return Snapshot(sequence // 2, temperature, width, height, population,
+                                    self._decode(names), data)
+            if time.time() > deadline:
+                raise IOError("No consistent snapshot of {0}".format(self.memory.name))
+
+    def _decode(self, names):
+        if self._names[0] != names:
+            self._names = (names, json.loads(names.decode("ascii")))
+        return self._names[1]
+
+
+def serve(tank, name, turn_time=1.0):
+    """ Run the tank provided without any display of its own, taking one turn
+        every `turn_time` seconds and publishing its state into the shared
+        memory segment of the name provided. This function does not return.
+    """
+    publisher = TankPublisher(name)
+    try:
+        while True:
+            started = time.time()
+            tank.turn()
+            publisher.publish(tank)
+            time.sleep(max(0.0, turn_time - (time.time() - started)))
+    finally:
+        publisher.close()
+
+
+def watch(name, interval=1.0, stream=sys.stdout):
+    """ Print a line summarising each new state published into the shared
+        memory segment of the name provided. This function does not return.
+    """
+    reader = TankReader(name)
+    try:
+        version = None
+        while True:
+            snapshot = reader.snapshot()
+            if snapshot is not None and snapshot.version != version:
+                version = snapshot.version
+                counts = sorted(snapshot.counts().items())
+                stream.write("{0} {1:.1f} {2}\n".format(version, snapshot.temperature, " ".join(
+                    "{0}={1}".format(kind, count) for kind, count in counts)))
+                stream.flush()
+            time.sleep(interval)
+    finally:
+        reader.close()
+
+
+def main(args):
+    """ Usage: simfish_shm.py serve|watch NAME
+    """
+    if len(args) != 2 or args[0] not in ("serve", "watch"):
+        sys.stderr.write(main.__doc__.strip() + "\n")
+        return 2
+    command, name = args
+    if command == "serve":
+        tank = simfish.Tank()
+        simfish.stock(tank)
+        serve(tank, name)
+    else:
+        watch(name)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
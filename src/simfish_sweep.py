@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Parameter sweeps for fish tanks
+
+    A sweep expands a grid of starting conditions, runs every point of the
+    grid for a number of random seeds across a pool of worker processes and
+    streams the population time series of each run into a single .npz file
+    as soon as that run finishes. Only the small per-run index is held in
+    memory, so memory use stays flat however many runs the sweep contains.
+
+    Within the output file, each run is stored as one array per column,
+    named "run<n>/<column>", each holding one value per turn. The index of
+    runs is stored as the arrays "point", "seed" and "param/<name>", each
+    holding one value per run. For example, with NumPy:
+
+        data = numpy.load("sweep.npz")
+        for n, seed in enumerate(data["seed"]):
+            print(seed, data["run{0}/PiranhaFish".format(n)][-1])
+
+    The .npz and .npy formats are written directly so NumPy is not needed
+    to run a sweep, only to read the results.
+"""
+
+import argparse
+import array
+import itertools
+import multiprocessing
+import random
+import struct
+import sys
+import zipfile
+
+import simfish
+
+# the parameters of each grid point, along with their default values
+PARAMETERS = (
+    ("temperature", 17.0),
+    ("prey", 20),
+    ("piranha_ratio", 0.1),
+    ("feed_rate", 1.0),
+)
+
+COLUMNS = ("temperature", "SunFish", "DiverFish", "PiranhaFish", "FishFood")
+
+
+def expand(grid):
+    """ Expand a grid, given as a mapping of parameter names to lists of
+        values, into a list of points, each a dictionary of parameter values.
+        Parameters missing from the grid take their default values.
+    """
+    unknown = set(grid) - set(name for name, _ in PARAMETERS)
+    if unknown:
+        raise ValueError("Unknown parameters: {0}".format(", ".join(sorted(unknown))))
+    names = [name for name, _ in PARAMETERS]
+    values = [grid.get(name, [default]) for name, default in PARAMETERS]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def run(point, seed, turns):
+    """ Run a single tank for the number of turns specified, starting from the
+        conditions at the grid point provided, and return its time series as
+        a dictionary of column names to arrays.
+    """
+    random.seed(seed)
+    tank = simfish.Tank(temperature=point["temperature"])
+    prey = int(point["prey"])
+    piranhas = int(round(prey * point["piranha_ratio"]))
+    fish = [simfish.SunFish() for i in range(prey - prey // 2)]
+    fish.extend(simfish.DiverFish() for i in range(prey // 2))
+    fish.extend(simfish.PiranhaFish() for i in range(piranhas))
+    for item in fish:
+        tank.put(item, x=random.randint(0, tank.width - 1), y=random.randint(0, tank.height - 1))
+    series = dict((column, array.array("i")) for column in COLUMNS[1:])
+    series["temperature"] = array.array("d")
+    food = 0.0
+    for turn in range(turns):
+        food += point["feed_rate"]
+        while food >= 1.0:
+            tank.put(simfish.FishFood())
+            food -= 1.0
+        tank.turn()
+        counts = dict.fromkeys(COLUMNS[1:], 0)
+        for item in tank:
+            name = type(item).__name__
+            if name in counts and (not isinstance(item, simfish.Animal) or item.alive):
+                counts[name] += item.count
+        for column, count in counts.items():
+            series[column].append(count)
+        series["temperature"].append(tank.temperature())
+    return series
+
+
+def _run_task(task):
+    number, _, point, seed, turns = task
+    return number, run(point, seed, turns)
+
+
+def npy(values, shape=None):
+    """ Encode an `array.array` in NumPy's .npy format.
+    """
+    if values.typecode in "fd":
+        kind = "f"
+    elif values.typecode in "BHILQ":
+        kind = "u"
+    else:
+        kind = "i"
+    descr = "{0}{1}{2}".format("<" if sys.byteorder == "little" else ">", kind, values.itemsize)
+    if shape is None:
+        shape = (len(values),)
+    header = "{{'descr': '{0}', 'fortran_order': False, 'shape': ({1}), }}".format(
+        descr, "".join("{0}, ".format(n) for n in shape).rstrip(" "))
+    # the magic string, version and header length occupy 10 bytes
+    header += " " * (63 - (10 + len(header)) % 64) + "\n"
+    data = values.tobytes() if hasattr(values, "tobytes") else values.tostring()
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("ascii") + data
+
+
+class NpzWriter(object):
+    """ Writes arrays one at a time into a .npz archive.
+    """
+
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, True)
+
+    def write(self, name, values):
+        self.zip.writestr(name + ".npy", npy(values))
+
+    def close(self):
+        self.zip.close()
+
+
+def sweep(path, grid, seeds=10, turns=1000, processes=None):
+    """ Run every point of the grid for each of the seeds specified (either a
+        number of seeds or a list of seeds), writing the results to the .npz
+        file at the path provided as each run finishes. With `processes` set
+        to 1, runs are carried out within this process. Return the number of
+        runs completed.
+    """
+    if isinstance(seeds, int):
+        seeds = range(seeds)
+    points = expand(grid)
+    tasks = []
+    for n, point in enumerate(points):
+        for seed in seeds:
+            tasks.append((len(tasks), n, point, seed, turns))
+    pool = None
+    if processes == 1:
+        results = map(_run_task, tasks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(_run_task, tasks)
+    writer = NpzWriter(path)
+    try:
+        for number, series in results:
+            for column in COLUMNS:
+                writer.write("run{0}/{1}".format(number, column), series[column])
+        writer.write("point", array.array("i", [task[1] for task in tasks]))
+        writer.write("seed", array.array("l", [task[3] for task in tasks]))
+        for name, _ in PARAMETERS:
+            writer.write("param/" + name, array.array("d", [task[2][name] for task in tasks]))
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return len(tasks)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Run a parameter sweep of fish tanks.")
+    parser.add_argument("output", help="the .npz file to which results are written")
+    for name, default in PARAMETERS:
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), nargs="+",
+                            default=[default], help="values of {0} (default {1})".format(name, default))
+    parser.add_argument("--seeds", type=int, default=10, help="number of seeds per point")
+    parser.add_argument("--turns", type=int, default=1000, help="number of turns per run")
+    parser.add_argument("--processes", type=int, help="number of worker processes")
+    options = parser.parse_args(args)
+    grid = dict((name, getattr(options, name)) for name, _ in PARAMETERS)
+    count = sweep(options.output, grid, options.seeds, options.turns, options.processes)
+    sys.stdout.write("{0} runs written to {1}\n".format(count, options.output))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
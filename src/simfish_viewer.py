@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Remote viewing for fish tanks
+
+    A `FrameServer` publishes the rendered frames of a tank over a local TCP
+    or Unix socket to any number of connected viewers. Each new viewer is sent
+    one full frame followed only by the cells which change from one frame to
+    the next. Every message is compressed and each viewer is rate limited
+    independently so that slow or distant observers cannot hold up the
+    simulation. A `FrameClient` rebuilds the frames at the other end and the
+    `view` function displays them within a curses window of its own.
+
+    Messages are framed on the wire as a four byte big-endian length followed
+    by a zlib-compressed payload. The first byte of each payload identifies
+    the message type:
+
+        F  a full frame, as lines of text separated by newlines
+        D  a sequence of changed runs, each a (row, column, length) header
+           packed as three unsigned shorts followed by the new characters;
+           a run at column 0 replaces the whole line
+"""
+
+import errno
+import select
+import socket
+import struct
+import sys
+import time
+import zlib
+
+import simfish
+
+FULL = b"F"
+DIFF = b"D"
+
+LENGTH = struct.Struct(">I")
+RUN = struct.Struct(">HHH")
+
+# unchanged gaps shorter than this are sent rather than starting a new run
+RUN_GAP = RUN.size
+
+
+def parse_address(address):
+    """ Convert an address string into a socket family and address. A string
+        of the form "host:port" denotes a TCP socket whereas anything else is
+        taken to be the path of a Unix socket.
+    """
+    if not isinstance(address, str):
+        return socket.AF_INET, address
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return socket.AF_INET, (host or "localhost", int(port))
+    return socket.AF_UNIX, address
+
+
+def encode_frame(lines):
+    """ Encode a complete frame as a compressed message.
+    """
+    return _message(FULL + "\n".join(lines).encode("ascii"))
+
+
+def encode_diff(old, new):
+    """ Encode the changes required to turn frame `old` into frame `new` as a
+        compressed message, or return None if the frames are identical. If
+        the frames differ in shape, a full frame is encoded instead.
+    """
+    if len(old) != len(new):
+        return encode_frame(new)
+    parts = [DIFF]
+    for row, (old_line, new_line) in enumerate(zip(old, new)):
+        if old_line == new_line:
+            continue
+        runs = list(_changed_runs(old_line, new_line))
+        if len(old_line) != len(new_line) or runs[0][0] == 0:
+            parts.append(RUN.pack(row, 0, len(new_line)) + new_line.encode("ascii"))
+            continue
+        for start, end in runs:
+            parts.append(RUN.pack(row, start, end - start) + new_line[start:end].encode("ascii"))
+    if len(parts) == 1:
+        return None
+    return _message(b"".join(parts))
+
+
+def apply_message(lines, payload):
+    """ Apply a decompressed message payload to the frame provided and return
+        the resulting frame.
+    """
+    kind, body = payload[:1], payload[1:]
+    if kind == FULL:
+        return body.decode("ascii").split("\n")
+    if kind != DIFF:
+        raise ValueError("Unknown message type {0!r}".format(kind))
+    lines = list(lines)
+    offset = 0
+    while offset < len(body):
+        row, column, length = RUN.unpack_from(body, offset)
+        offset += RUN.size
+        text = body[offset:offset + length].decode("ascii")
+        offset += length
+        while len(lines) <= row:
+            lines.append("")
+        if column == 0:
+            lines[row] = text
+        else:
+            line = lines[row]
+            lines[row] = line[:column] + text + line[column + length:]
+    return lines
+
+
+def _message(payload):
+    data = zlib.compress(payload)
+    return LENGTH.pack(len(data)) + data
+
+
+def _changed_runs(old_line, new_line):
+    """ Yield (start, end) pairs bounding the runs of characters which differ
+        between two lines of equal length. Runs separated by only a short
+        stretch of unchanged characters are merged.
+    """
+    start = end = None
+    for i, (a, b) in enumerate(zip(old_line, new_line)):
+        if a != b:
+            if start is None:
+                start = i
+            elif i - end > RUN_GAP:
+                yield start, end
+                start = i
+            end = i + 1
+    if start is not None:
+        yield start, end
+
+
+class FrameServer(object):
+    """ Publishes tank frames to connected viewers. The server never blocks:
+        new connections are accepted and pending output is flushed each time
+        a frame is published. A viewer which has not finished receiving its
+        previous message simply misses frames until it catches up, at which
+        point it is sent the difference from the last frame it received.
+    """
+
+    class Viewer(object):
+        """ The server-side state of a single connected viewer.
+        """
+
+        def __init__(self, sock):
+            self.socket = sock
+            self.frame = None
+            self.pending = b""
+            self.last_sent = 0.0
+
+    def __init__(self, address, interval=0.1):
+        """ Listen for viewers on the address provided. No viewer will be sent
+            more than one frame per `interval` seconds.
+        """
+        family, self.address = parse_address(address)
+        self.interval = interval
+        self.viewers = []
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(self.address)
+        self.socket.listen(5)
+        self.socket.setblocking(False)
+        if family == socket.AF_INET:
+            self.address = self.socket.getsockname()
+
+    def close(self):
+        """ Disconnect all viewers and stop listening.
+        """
+        for viewer in self.viewers:
+            viewer.socket.close()
+        self.viewers = []
+        self.socket.close()
+
+    def accept(self):
+        """ Accept any viewers waiting to connect.
+        """
+        while True:
+            try:
+                sock, _ = self.socket.accept()
+            except socket.error as error:
+                if error.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+            sock.setblocking(False)
+            self.viewers.append(FrameServer.Viewer(sock))
+
+    def publish(self, lines, now=None):
+        """ Offer a new frame to all viewers. Each message is encoded only
+            once however many viewers share the same previous frame.
+        """
+        if now is None:
+            now = time.time()
+        self.accept()
+        messages = {}
+        for viewer in self.viewers[:]:
+            if viewer.pending and not self._flush(viewer):
+                continue
+            if viewer.pending or now - viewer.last_sent < self.interval:
+                continue
+            key = id(viewer.frame)
+            if key not in messages:
+                if viewer.frame is None:
+                    messages[key] = encode_frame(lines)
+                else:
+                    messages[key] = encode_diff(viewer.frame, lines)
+            message = messages[key]
+            if message is None:
+                continue
+            viewer.frame = lines
+            viewer.pending = message
+            viewer.last_sent = now
+            self._flush(viewer)
+
+    def _flush(self, viewer):
+        """ Send as much pending output as the viewer will accept, returning
+            false if the viewer has disconnected.
+        """
+        try:
+            sent = viewer.socket.send(viewer.pending)
+        except socket.error as error:
+            if error.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return True
+            viewer.socket.close()
+            self.viewers.remove(viewer)
+            return False
+        viewer.pending = viewer.pending[sent:]
+        return True
+
+
+class FrameClient(object):
+    """ Receives frames from a `FrameServer` and keeps a copy of the latest.
+    """
+
+    def __init__(self, address):
+        family, address = parse_address(address)
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.connect(address)
+        self.buffer = b""
+        self.lines = []
+
+    def close(self):
+        self.socket.close()
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def receive(self, timeout=None):
+        """ Wait up to `timeout` seconds for data from the server and apply
+            every complete message received. Return true if the frame has
+            changed, or raise EOFError if the server has gone away.
+        """
+        readable, _, _ = select.select([self.socket], [], [], timeout)
+        if not readable:
+            return False
+        data = self.socket.recv(65536)
+        if not data:
+            raise EOFError("Connection closed by server")
+        self.buffer += data
+        changed = False
+        while len(self.buffer) >= LENGTH.size:
+            size, = LENGTH.unpack_from(self.buffer)
+            if len(self.buffer) < LENGTH.size + size:
+                break
+            data = self.buffer[LENGTH.size:LENGTH.size + size]
+            self.buffer = self.buffer[LENGTH.size + size:]
+            self.lines = apply_message(self.lines, zlib.decompress(data))
+            changed = True
+        return changed
+
+
+def serve(tank, address, interval=0.1, turn_time=1.0):
+    """ Run the tank provided without any display of its own, taking one turn
+        every `turn_time` seconds and publishing frames to viewers connected
+        on the address provided. This function does not return.
+    """
+    server = FrameServer(address, interval)
+    try:
+        while True:
+            started = time.time()
+            tank.turn()
+            server.publish(tank.render())
+            time.sleep(max(0.0, turn_time - (time.time() - started)))
+    finally:
+        server.close()
+
+
+def view(screen, address):
+    """ Display the frames published by the server at the address provided
+        until the server goes away or Q is pressed.
+    """
+    import curses
+    curses.curs_set(0)
+    screen.nodelay(True)
+    client = FrameClient(address)
+    try:
+        while screen.getch() != ord('q'):
+            try:
+                changed = client.receive(0.05)
+            except EOFError:
+                break
+            if changed:
+                screen.erase()
+                for y, line in enumerate(client.lines):
+                    try:
+                        screen.addstr(y, 0, line)
+                    except curses.error:
+                        pass
+                screen.refresh()
+    finally:
+        client.close()
+
+
+def main(args):
+    """ Usage: simfish_viewer.py serve|view ADDRESS
+
+        An ADDRESS of the form host:port refers to a TCP socket, anything else
+        is the path of a Unix socket.
+    """
+    if len(args) != 2 or args[0] not in ("serve", "view"):
+        sys.stderr.write(main.__doc__.strip() + "\n")
+        return 2
+    command, address = args
+    if command == "serve":
+        tank = simfish.Tank()
+        simfish.stock(tank)
+        serve(tank, address)
+    else:
+        import curses
+        curses.wrapper(view, address)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import simfish
+import unittest
+
+try:
+    import simfish_batch
+except ImportError:
+    simfish_batch = None
+
+
+@unittest.skipIf(simfish_batch is None, "NumPy is not installed")
+class BatchTankTest(unittest.TestCase):
+
+    def test_can_put_into_every_tank(self):
+        batch = simfish_batch.BatchTank(5, capacity=4)
+        batch.put("SunFish", x=3, y=2)
+        batch.put("FishFood", tanks=[0, 1])
+        self.assertEqual(7, len(batch))
+        self.assertEqual([1, 1, 0, 0, 0], list(batch.counts()[:, batch.food]))
+        self.assertEqual(simfish.SunFish.ENERGY, batch.energy[4, 0])
+
+    def test_cannot_put_into_full_tank(self):
+        batch = simfish_batch.BatchTank(2, capacity=1)
+        batch.put("Snail", tanks=0)
+        self.assertRaises(ValueError, batch.put, "Snail")
+
+    def test_can_feed_on_food_and_fish(self):
+        batch = simfish_batch.BatchTank(2, capacity=4, temperature=16.0)
+        batch.put("SunFish", x=1, y=1)
+        batch.put("FishFood", x=1, y=1, tanks=0)
+        batch.put("PiranhaFish", x=1, y=1, tanks=1)
+        batch.feed()
+        self.assertEqual(1, len(batch.tank(0)))
+        self.assertEqual(simfish.SunFish.ENERGY + 10, batch.energy[0, 0])
+        self.assertEqual(1, len(batch.tank(1)))
+        self.assertEqual(simfish.PiranhaFish.ENERGY + simfish.SunFish.ENERGY, batch.energy[1, 1])
+
+    def test_each_animal_eats_once(self):
+        batch = simfish_batch.BatchTank(1, capacity=8)
+        for i in range(3):
+            batch.put("FishFood", x=2, y=2)
+        batch.put("SunFish", x=2, y=2)
+        batch.put("SunFish", x=2, y=2)
+        batch.feed()
+        self.assertEqual([0, 2, 0, 0, 1], list(batch.counts()[0]))
+        self.assertEqual([simfish.SunFish.ENERGY + 10] * 2, list(batch.energy[0, 3:5]))
+
+    def test_cold_piranha_will_not_feed_and_dies(self):
+        batch = simfish_batch.BatchTank(1, capacity=4, temperature=14.0)
+        batch.put("PiranhaFish", x=1, y=1)
+        batch.put("SunFish", x=1, y=1)
+        batch.turn()
+        self.assertEqual(2, len(batch))
+        self.assertEqual(0, batch.energy[0, 0])
+
+    def test_food_sinks_to_the_floor(self):
+        batch = simfish_batch.BatchTank(3, capacity=1)
+        batch.put("FishFood", x=0, y=0)
+        for i in range(batch.height + 2):
+            batch.turn()
+        self.assertEqual([batch.height - 1] * 3, list(batch.y[:, 0]))
+
+    def test_swimmers_reverse_at_the_edge(self):
+        batch = simfish_batch.BatchTank(10, capacity=1)
+        batch.put("SunFish", x=batch.width - 1, y=5, direction=simfish.EAST)
+        batch.turn()
+        self.assertEqual([batch.width - 1] * 10, list(batch.x[:, 0]))
+        self.assertEqual([simfish.WEST] * 10, list(batch.direction[:, 0]))
+        self.assertEqual([simfish.SunFish.ENERGY - 1] * 10, list(batch.energy[:, 0]))
+
+    def test_can_extract_tank(self):
+        batch = simfish_batch.BatchTank(2, capacity=8, seed=1)
+        for name in ["Snail", "SunFish", "DiverFish", "FishFood"]:
+            batch.put(name)
+        for i in range(5):
+            batch.turn()
+        tank = batch.tank(1)
+        self.assertEqual(len(batch) // 2, len(tank))
+        self.assertEqual(batch.temperature[1], tank.temperature())
+        occupied = batch.kind[1] != simfish_batch.EMPTY
+        positions = sorted((int(x), int(y)) for x, y in zip(batch.x[1][occupied], batch.y[1][occupied]))
+        self.assertEqual(positions, sorted(tank._positions[item] for item in tank))
+
+    def test_seeded_batches_are_repeatable(self):
+        counts = []
+        for i in range(2):
+            batch = simfish_batch.BatchTank(20, capacity=64, seed=7)
+            for name in ["SunFish", "DiverFish", "PiranhaFish"]:
+                batch.put(name, y=batch.random.randint(0, batch.height, 20))
+            for turn in range(30):
+                batch.put("FishFood")
+                batch.turn()
+            counts.append(batch.counts().tolist())
+        self.assertEqual(counts[0], counts[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
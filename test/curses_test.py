@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import simfish
+import simfish_curses
+import threading
+import time
+import unittest
+
+
+class TestScreen(object):
+    """ Mock curses window returning queued key presses from `getch` and
+        recording the text shown by each call to `refresh`, which takes
+        `refresh_time` seconds.
+    """
+
+    def __init__(self, keys="", refresh_time=0.0):
+        self.keys = [ord(ch) for ch in keys]
+        self.delay = simfish_curses.TURN_TIME
+        self.refresh_time = refresh_time
+        self.text = []
+        self.frames = []
+        self.erased = 0
+        self.threads = set()
+
+    def timeout(self, delay):
+        self.delay = delay
+
+    def getch(self):
+        if self.keys:
+            return self.keys.pop(0)
+        return -1
+
+    def getmaxyx(self):
+        return 50, 200
+
+    def addstr(self, y, x, text):
+        self.threads.add(threading.current_thread())
+        self.text.append(text.decode("ascii") if isinstance(text, bytes) else text)
+
+    def erase(self):
+        self.erased += 1
+
+    def refresh(self):
+        time.sleep(self.refresh_time)
+        self.frames.append(self.text)
+        self.text = []
+
+
+class InputTest(unittest.TestCase):
+
+    def test_reads_every_pending_key(self):
+        screen = TestScreen("ff[s")
+        self.assertEqual([ord(ch) for ch in "ff[s"], simfish_curses.read_keys(screen))
+        self.assertEqual(simfish_curses.TURN_TIME, screen.delay)
+        self.assertEqual([], simfish_curses.read_keys(screen))
+
+    def test_coalesces_runs_of_keys(self):
+        self.assertEqual([(ord('f'), 200), (ord('s'), 2), (ord('f'), 1)],
+                         simfish_curses.coalesce([ord(ch) for ch in 200 * "f" + "ssf"]))
+
+    def test_coalesces_temperature_changes(self):
+        self.assertEqual([(ord(']'), -3), (ord('r'), 1), (ord(']'), 0)],
+                         simfish_curses.coalesce([ord(ch) for ch in "[[][[r[]"]))
+
+    def test_bulk_food_drop(self):
+        random.seed(0)
+        tank = simfish.Tank()
+        simfish_curses.drop(tank, simfish.FishFood, 200)
+        self.assertEqual(200, len(tank))
+        self.assertTrue(len(list(tank)) <= tank.width)
+        self.assertEqual(2000, sum(food.energy for food in tank))
+
+    def test_bulk_fish_drop(self):
+        random.seed(0)
+        tank = simfish.Tank()
+        simfish_curses.drop(tank, simfish.SunFish, 100)
+        simfish_curses.drop(tank, simfish.ClockworkFish, 3)
+        self.assertEqual(103, len(tank))
+        self.assertTrue(len(list(tank)) <= 2 * tank.width + 3)
+
+
+class CommandTest(unittest.TestCase):
+
+    def play(self, keys):
+        tank = simfish.Tank(temperature=17.0)
+        tank.viewport = simfish.Viewport()
+        batches = []
+        tank.subscribe(batches.append, ["warm", "cool"])
+        simfish_curses.run(TestScreen(keys + "q"), tank)
+        tank.events.flush()
+        return [(topic, round(temperature, 1)) for batch in batches for topic, temperature in batch]
+
+    def test_cooling_keys_cool_the_tank(self):
+        self.assertEqual([("cool", 16.7)], self.play("[[["))
+
+    def test_warming_keys_warm_the_tank(self):
+        self.assertEqual([("warm", 17.2)], self.play("]]"))
+
+    def test_net_zero_temperature_change_is_skipped(self):
+        self.assertEqual([], self.play("[]"))
+
+
+class RendererTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tank = simfish.Tank(temperature=16.0)
+        self.tank.put(simfish.SunFish(direction=simfish.EAST), x=2, y=2)
+
+    def test_frames_are_drawn_on_another_thread(self):
+        screen = TestScreen()
+        renderer = simfish_curses.Renderer(screen)
+        renderer.start()
+        renderer.publish(self.tank, ["footer"], erase=True)
+        renderer.stop()
+        self.assertEqual(1, renderer.drawn)
+        self.assertEqual(str(self.tank.compose()), screen.frames[0][0])
+        self.assertEqual("footer", screen.frames[0][1])
+        self.assertEqual(1, screen.erased)
+        self.assertFalse(threading.current_thread() in screen.threads)
+
+    def test_publishing_does_not_wait_for_the_screen(self):
+        screen = TestScreen(refresh_time=0.5)
+        renderer = simfish_curses.Renderer(screen)
+        renderer.start()
+        started = time.time()
+        for turn in range(20):
+            self.tank.turn()
+            renderer.publish(self.tank)
+        elapsed = time.time() - started
+        renderer.stop()
+        self.assertTrue(elapsed < 0.5, elapsed)
+        self.assertEqual(20, renderer.drawn + renderer.dropped)
+        self.assertTrue(renderer.drawn < 20)
+        self.assertEqual(str(self.tank.compose()), screen.frames[-1][0])
+
+    def test_published_frames_are_not_changed(self):
+        screen = TestScreen()
+        renderer = simfish_curses.Renderer(screen)
+        renderer.start()
+        renderer.publish(self.tank)
+        renderer.stop()
+        frame = renderer._front
+        drawn = str(frame)
+        self.tank.put(simfish.Snail(), x=5, y=5)
+        renderer.publish(self.tank)
+        self.assertEqual(drawn, str(frame))
+        self.assertFalse(renderer._back is frame)
+
+    def test_keys_are_polled_under_the_lock(self):
+        screen = TestScreen("ff")
+        lock = threading.Lock()
+        self.assertEqual([ord('f'), ord('f')], simfish_curses.read_keys(screen, lock))
+        self.assertEqual(simfish_curses.TURN_TIME, screen.delay)
+        with lock:
+            keys = []
+            thread = threading.Thread(target=lambda: keys.extend(simfish_curses.read_keys(screen, lock)))
+            thread.start()
+            screen.keys.append(ord('s'))
+            time.sleep(0.05)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+        self.assertEqual([ord('s')], keys)
+
+
+if __name__ == "__main__":
+    unittest.main()
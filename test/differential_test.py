@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import simfish
+import unittest
+
+from testutil import DifferentialHarness
+
+
+def forked(**kwargs):
+    return simfish.Tank(**kwargs).fork()
+
+
+class UnstackedTank(simfish.Tank):
+    """ A tank which never merges its items into stacks or schools.
+    """
+
+    def _compact(self, coords):
+        pass
+
+
+class ForgetfulTank(simfish.Tank):
+    """ A faulty tank which never removes its dead.
+    """
+
+    def remove_dead(self):
+        pass
+
+
+class DifferentialHarnessTest(unittest.TestCase):
+
+    def test_reference_agrees_with_itself(self):
+        DifferentialHarness(simfish.Tank, simfish.Tank).check(seeds=range(5))
+
+    def test_forked_tank_agrees(self):
+        DifferentialHarness(simfish.Tank, forked).check()
+
+    def test_unstacked_tank_agrees(self):
+        DifferentialHarness(simfish.Tank, UnstackedTank).check(seeds=range(300))
+
+    def test_unstacked_tank_agrees_in_a_crowded_tank(self):
+        DifferentialHarness(simfish.Tank, UnstackedTank, width=4, height=3).check(seeds=range(100), length=80)
+
+    def test_scripts_put_several_items_at_once(self):
+        harness = DifferentialHarness(simfish.Tank, simfish.Tank)
+        script = harness.script(random.Random(0), 200)
+        self.assertTrue(any(command[0] == "put" and command[5] > 1 for command in script))
+        tank = simfish.Tank(width=harness.width, height=harness.height)
+        harness.apply(tank, ("put", "SunFish", 1, 1, simfish.EAST, 3))
+        self.assertEqual(3, len(tank))
+        self.assertEqual([((1, 1), 1)], [(coords, len(items)) for coords, items in tank.cells()])
+
+    def test_scripts_are_repeatable(self):
+        harness = DifferentialHarness(simfish.Tank, simfish.Tank)
+        script = harness.script(random.Random(3), 40)
+        self.assertEqual(script, harness.script(random.Random(3), 40))
+        self.assertEqual(harness.run(simfish.Tank, script, 3), harness.run(simfish.Tank, script, 3))
+
+    def test_faulty_tank_is_caught_and_shrunk(self):
+        harness = DifferentialHarness(simfish.Tank, ForgetfulTank)
+        try:
+            harness.check(length=80)
+        except AssertionError as e:
+            message = str(e)
+        else:
+            self.fail("The faulty tank was not caught")
+        self.assertTrue("'remove_dead'" in message)
+        script = [line for line in message.splitlines() if line.startswith("    (")]
+        self.assertTrue(len(script) <= 4, message)
+
+    def test_shrink_keeps_the_script_failing(self):
+        harness = DifferentialHarness(simfish.Tank, ForgetfulTank)
+        script = [("put", "PiranhaFish", 1, 1, simfish.EAST), ("turn",), ("cool", 30), ("turn",),
+                  ("put", "Snail", 2, 2, simfish.WEST), ("remove_dead",), ("turn",)]
+        shrunk = harness.shrink(script, 0)
+        self.assertNotEqual(None, harness.divergence(shrunk, 0))
+        self.assertEqual(("remove_dead",), shrunk[-1])
+        self.assertTrue(len(shrunk) < len(script))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import simfish
+import unittest
+
+
+class EventBusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tank = simfish.Tank(temperature=16.0)
+        self.batches = []
+
+    def topics(self):
+        return [[event[0] for event in batch] for batch in self.batches]
+
+    def test_unobserved_tank_has_no_bus(self):
+        self.assertEqual(None, self.tank.events)
+        subscription = self.tank.subscribe(self.batches.append)
+        self.assertNotEqual(None, self.tank.events)
+        self.tank.unsubscribe(subscription)
+        self.assertEqual(None, self.tank.events)
+
+    def test_events_are_delivered_once_per_turn(self):
+        self.tank.subscribe(self.batches.append)
+        fish = simfish.SunFish(direction=simfish.EAST)
+        self.tank.put(fish, x=3, y=3)
+        self.tank.warm()
+        self.assertEqual([], self.batches)
+        self.tank.turn()
+        self.assertEqual(1, len(self.batches))
+        self.assertEqual(("put", fish, 3, 3), self.batches[0][0])
+        self.assertEqual(("warm", 16.1), self.batches[0][1])
+
+    def test_only_subscribed_topics_are_kept(self):
+        self.tank.subscribe(self.batches.append, ["eat"])
+        self.assertEqual(frozenset(["eat"]), self.tank.events.topics)
+        piranha_fish = simfish.PiranhaFish()
+        sun_fish = simfish.SunFish()
+        self.tank.put(piranha_fish, x=1, y=1)
+        self.tank.put(sun_fish, x=1, y=1)
+        self.tank.turn()
+        self.assertEqual([[("eat", piranha_fish, sun_fish, simfish.SunFish.ENERGY)]], self.batches)
+
+    def test_subscribers_receive_their_own_topics(self):
+        moves = []
+        self.tank.subscribe(self.batches.append)
+        self.tank.subscribe(moves.append, ["move"])
+        self.tank.put(simfish.FishFood(), x=0, y=0)
+        self.tank.turn()
+        self.assertEqual(["put", "move"], [event[0] for event in self.batches[0] if event[0] in ("put", "move")])
+        self.assertEqual([[("move", self.batches[0][0][1], 0, 1)]], moves)
+
+    def test_deaths_and_removals(self):
+        self.tank.subscribe(self.batches.append, ["kill", "remove_dead", "remove", "empty"])
+        self.tank.cool(20)
+        piranha_fish = simfish.PiranhaFish()
+        snail = simfish.Snail()
+        self.tank.put(piranha_fish)
+        self.tank.put(snail)
+        self.tank.turn()
+        self.tank.remove_dead()
+        self.tank.remove(snail)
+        self.tank.empty()
+        self.tank.turn()
+        self.assertEqual([[("kill", piranha_fish)],
+                          [("remove_dead", [piranha_fish]), ("remove", snail), ("empty",)]], self.batches)
+
+    def test_nothing_removed_emits_nothing(self):
+        self.tank.subscribe(self.batches.append, ["remove_dead"])
+        self.tank.put(simfish.Snail())
+        self.tank.remove_dead()
+        self.tank.events.flush()
+        self.assertEqual([], self.batches)
+
+    def test_unknown_topics_are_rejected(self):
+        self.assertRaises(ValueError, self.tank.subscribe, self.batches.append, ["hatch"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -28,6 +28,38 @@ class FishFoodTest(unittest.TestCase):
         self.assertEqual(0, tank.total_dx)
         self.assertEqual(1, tank.total_dy)
 
+    def test_stacks_with_equal_portions(self):
+        self.assertTrue(simfish.FishFood().stacks_with(simfish.FishFood()))
+        self.assertFalse(simfish.FishFood().stacks_with(simfish.FishFood(energy=42)))
+        self.assertFalse(simfish.FishFood().stacks_with(simfish.SunFish()))
+
+    def test_can_take_portions_from_stack(self):
+        fish_food = simfish.FishFood()
+        fish_food.absorb(simfish.FishFood())
+        fish_food.absorb(simfish.FishFood())
+        self.assertEqual(3, fish_food.count)
+        self.assertEqual(30, fish_food.energy)
+        self.assertEqual(10, fish_food.take())
+        self.assertEqual(2, fish_food.count)
+        self.assertEqual(20, fish_food.energy)
+
+    def test_can_create_stack(self):
+        fish_food = simfish.FishFood.stack(4, energy=5)
+        self.assertEqual(4, fish_food.count)
+        self.assertEqual(20, fish_food.energy)
+        self.assertTrue(fish_food.stacks_with(simfish.FishFood(energy=5)))
+
+    def test_fish_eat_one_portion_from_stack(self):
+        tank = TestTank()
+        fish_food = simfish.FishFood()
+        fish_food.absorb(simfish.FishFood())
+        tank.add_items_with(fish_food)
+        sun_fish = simfish.SunFish()
+        sun_fish.turn(tank)
+        self.assertEqual(simfish.SunFish.ENERGY + 10 - 1, sun_fish.energy)
+        self.assertEqual([fish_food], tank.items_with(sun_fish))
+        self.assertEqual(1, fish_food.count)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import random
+import simfish
+import unittest
+
+from testutil import TestFish
+
+
+class TestWindow(object):
+    """ Mock curses window recording each call to `addstr`.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.calls = []
+
+    def getmaxyx(self):
+        return 100, self.columns
+
+    def addstr(self, y, x, text):
+        self.calls.append((y, x, text))
+
+
+class FrameBufferTest(unittest.TestCase):
+
+    def test_empty_frame_shows_empty_tank(self):
+        frame = simfish.FrameBuffer(width=8, height=1)
+        self.assertEqual([
+            "|" + 40 * "~" + "|",
+            "|" + 40 * " " + "|",
+            "|" + 40 * " " + "|",
+            "+" + 40 * "-" + "+",
+            42 * " ",
+        ], frame.lines())
+
+    def test_narrow_frame_leaves_room_for_status(self):
+        frame = simfish.FrameBuffer(width=1, height=1)
+        frame.put_status("tank temperature is 17.0 degrees")
+        lines = frame.lines()
+        self.assertEqual("|~~~~~|", lines[0].rstrip())
+        self.assertEqual("tank temperature is 17.0 degrees", lines[-1].rstrip())
+
+    def test_can_put_sprite(self):
+        frame = simfish.FrameBuffer(width=8, height=2)
+        frame.put_sprite(1, 1, ["abcde", "fghijk"])
+        lines = frame.lines()
+        self.assertEqual("|     abcde", lines[3][:11])
+        self.assertEqual("|     fghij ", lines[4][:12])
+
+    def test_clear_removes_sprites(self):
+        frame = simfish.FrameBuffer()
+        empty = frame.lines()
+        frame.put_sprite(3, 4, ["abcde", "fghij"])
+        self.assertNotEqual(empty, frame.lines())
+        frame.clear()
+        self.assertEqual(empty, frame.lines())
+
+    def test_can_write_to_stream(self):
+        frame = simfish.FrameBuffer()
+        stream = io.BytesIO()
+        frame.write(stream)
+        self.assertEqual(str(frame) + "\n", stream.getvalue().decode("ascii"))
+
+    def test_can_blit_in_one_call(self):
+        frame = simfish.FrameBuffer()
+        window = TestWindow(columns=200)
+        frame.blit(window)
+        self.assertEqual(1, len(window.calls))
+        self.assertEqual(str(frame), window.calls[0][2].decode("ascii"))
+
+    def test_can_blit_to_narrow_window(self):
+        frame = simfish.FrameBuffer()
+        window = TestWindow(columns=frame.columns)
+        frame.blit(window)
+        self.assertEqual(frame.rows, len(window.calls))
+
+    def test_tank_composes_items(self):
+        tank = simfish.Tank()
+        fish = TestFish(direction=simfish.EAST)
+        tank.put(fish, x=2, y=3)
+        lines = tank.render()
+        self.assertEqual(fish.sprite[0], lines[7][11:16])
+        self.assertEqual(fish.sprite[1], lines[8][11:16])
+        self.assertEqual("tank temperature is 17.0 degrees", lines[-1].rstrip())
+
+
+class ViewportTest(unittest.TestCase):
+
+    def test_frame_without_surface_or_floor(self):
+        frame = simfish.FrameBuffer(width=8, height=1, surface=False, floor=False)
+        self.assertEqual(["|" + 40 * " " + "|"] * 4, frame.lines()[:4])
+
+    def test_viewport_is_fitted_within_tank(self):
+        tank = simfish.Tank(width=100, height=50)
+        viewport = simfish.Viewport(x=95, y=45)
+        viewport.fit(tank, columns=80, rows=24)
+        self.assertEqual((15, 10), (viewport.width, viewport.height))
+        self.assertEqual((85, 40), (viewport.x, viewport.y))
+        viewport.scroll(tank, -100, 3)
+        self.assertEqual((0, 40), (viewport.x, viewport.y))
+        viewport.fit(tank, columns=1000, rows=1000)
+        self.assertEqual((0, 0, 100, 50), (viewport.x, viewport.y, viewport.width, viewport.height))
+
+    def test_compose_only_cells_in_view(self):
+        tank = simfish.Tank(width=100, height=50)
+        fish = simfish.SunFish(direction=simfish.EAST)
+        tank.put(fish, x=12, y=7)
+        tank.put(simfish.SunFish(direction=simfish.EAST), x=40, y=40)
+        tank.viewport = simfish.Viewport(10, 5, 12, 4)
+        lines = tank.render()
+        self.assertEqual(4 * simfish.UNIT_HEIGHT + 3, len(lines))
+        self.assertEqual("|" + 60 * " " + "|", lines[0])
+        self.assertEqual(fish.sprite[0], lines[5][11:16])
+        self.assertEqual(1, sum(line.count(fish.sprite[0]) for line in lines))
+        self.assertTrue(lines[-1].rstrip().endswith("17.0 degrees at 10,5 of 100x50"))
+
+    def test_minimap_follows_tank(self):
+        random.seed(1)
+        tank = simfish.Tank(width=40, height=20)
+        for i in range(200):
+            tank.put(random.choice([simfish.SunFish, simfish.PiranhaFish, simfish.FishFood])(),
+                     x=random.randint(0, 39), y=random.randint(0, 19))
+        lines = tank.minimap(columns=8, rows=4)
+        self.assertEqual([8] * 4, [len(line) for line in lines])
+        for turn in range(10):
+            tank.turn()
+        # a map counted afresh matches the one kept up to date
+        self.assertEqual(list(simfish.DensityMap(tank, 5, 5).counts), list(tank._density.counts))
+        self.assertEqual(len(tank), sum(tank._density.counts))
+
+    def test_minimap_shading(self):
+        tank = simfish.Tank(width=4, height=2)
+        tank.put(simfish.FishFood.stack(9), x=0, y=0)
+        tank.put(simfish.FishFood(), x=3, y=1)
+        self.assertEqual(["@   ", "   ."], tank.minimap(columns=4, rows=2))
+
+
+if __name__ == "__main__":
+    unittest.main()
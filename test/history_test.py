@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import simfish
+import unittest
+
+
+class RingBufferTest(unittest.TestCase):
+
+    def test_keeps_most_recent_values(self):
+        ring = simfish.RingBuffer(3)
+        for value in range(5):
+            ring.append(value)
+        self.assertEqual(3, len(ring))
+        self.assertEqual([2.0, 3.0, 4.0], list(ring))
+        self.assertEqual([3.0, 4.0], ring.last(2))
+        self.assertEqual([2.0, 3.0, 4.0], ring.last(10))
+
+
+class HistoryTest(unittest.TestCase):
+
+    def test_can_downsample(self):
+        history = simfish.History(size=4, factor=2, levels=3)
+        for value in range(8):
+            history.append(value)
+        self.assertEqual([4.0, 5.0, 6.0, 7.0], history.series(0))
+        self.assertEqual([(0, 0.5, 1), (2, 2.5, 3), (4, 4.5, 5), (6, 6.5, 7)], history.series(1))
+        self.assertEqual([(0, 1.5, 3), (4, 5.5, 7)], history.series(2))
+
+    def test_memory_is_bounded(self):
+        history = simfish.History(size=4, factor=2, levels=3)
+        for value in range(1000):
+            history.append(value)
+        self.assertEqual(4, len(history.series(0)))
+        self.assertEqual(4, len(history.series(1)))
+        self.assertEqual(4, len(history.series(2)))
+        self.assertEqual((984, 991.5, 999), history.summary())
+
+    def test_summary_of_nothing(self):
+        self.assertEqual(None, simfish.History().summary())
+
+
+class PopulationHistoryTest(unittest.TestCase):
+
+    def test_records_each_turn(self):
+        tank = simfish.Tank()
+        tank.history = simfish.PopulationHistory()
+        tank.put(simfish.SunFish(), x=3, y=3)
+        tank.put(simfish.SunFish(), x=5, y=3)
+        tank.put(simfish.ClockworkFish(), x=5, y=5)
+        for i in range(5):
+            tank.turn()
+        self.assertEqual(5, tank.history.turns)
+        self.assertEqual([2.0] * 5, tank.history["SunFish"].series())
+        self.assertEqual([1.0] * 5, tank.history["ClockworkFish"].series())
+        self.assertEqual([0.0] * 5, tank.history["PiranhaFish"].series())
+        self.assertEqual(2 * simfish.SunFish.ENERGY - 2, tank.history["energy"].series()[0])
+
+    def test_counts_energy_of_every_member_of_a_school(self):
+        tank = simfish.Tank()
+        tank.history = simfish.PopulationHistory()
+        tank.put(simfish.SunFish.school(4), x=3, y=3)
+        tank.history.record(tank)
+        self.assertEqual([4.0], tank.history["SunFish"].series())
+        self.assertEqual([4.0 * simfish.SunFish.ENERGY], tank.history["energy"].series())
+
+    def test_can_report(self):
+        tank = simfish.Tank()
+        tank.history = simfish.PopulationHistory()
+        tank.put(simfish.Snail())
+        tank.turn()
+        lines = tank.history.report(width=20)
+        self.assertTrue(lines[0].startswith("history of 1 turns"))
+        self.assertTrue(any(line.startswith("Snail ") for line in lines))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import simfish
+import unittest
+
+
+class TimingWheelTest(unittest.TestCase):
+
+    def run_wheel(self, wheel, turns):
+        fired = []
+        for turn in range(turns):
+            fired.extend((wheel.now, event.action) for event in wheel.advance())
+        return fired
+
+    def test_events_fire_when_due(self):
+        random.seed(0)
+        # a small wheel, reaching only 64 turns ahead, to exercise every level
+        wheel = simfish.TimingWheel(levels=3, bits=2)
+        expected = []
+        for name in range(500):
+            delay = random.randint(1, 300)
+            wheel.schedule(delay, name)
+            expected.append((delay, name))
+        self.assertEqual(sorted(expected), sorted(self.run_wheel(wheel, 300)))
+
+    def test_events_beyond_reach_fire_when_due(self):
+        for levels in (1, 2, 3):
+            random.seed(levels)
+            wheel = simfish.TimingWheel(levels=levels, bits=2)
+            expected = []
+            fired = []
+            for turn in range(400):
+                if turn < 100:
+                    delay = random.randint(1, 250)
+                    name = (levels, turn)
+                    wheel.schedule(delay, name)
+                    expected.append((wheel.now + delay, name))
+                fired.extend((wheel.now, event.action) for event in wheel.advance())
+            self.assertEqual(sorted(expected), sorted(fired))
+
+    def test_events_fire_in_the_order_scheduled(self):
+        wheel = simfish.TimingWheel(levels=2, bits=2)
+        wheel.schedule(6, "A")
+        self.run_wheel(wheel, 3)
+        wheel.schedule(3, "B")
+        self.assertEqual([(6, "A"), (6, "B")], self.run_wheel(wheel, 3))
+
+    def test_events_at_every_level_fire_in_the_order_scheduled(self):
+        random.seed(1)
+        wheel = simfish.TimingWheel(levels=3, bits=2)
+        expected = []
+        fired = []
+        for turn in range(300):
+            if turn < 100:
+                for name in range(random.randint(0, 3)):
+                    delay = random.randint(1, 150)
+                    wheel.schedule(delay, (turn, name))
+                    expected.append((wheel.now + delay, (turn, name)))
+            fired.extend(self.run_wheel(wheel, 1))
+        self.assertEqual(sorted(expected, key=lambda event: event[0]), fired)
+
+    def test_events_scheduled_later_fire_when_due(self):
+        wheel = simfish.TimingWheel(levels=2, bits=2)
+        fired = []
+        for turn in range(100):
+            wheel.schedule(turn % 23 + 1, wheel.now + turn % 23 + 1)
+            fired.extend((wheel.now, event.action) for event in wheel.advance())
+        self.assertTrue(fired)
+        for now, due in fired:
+            self.assertEqual(due, now)
+
+    def test_repeating_events(self):
+        wheel = simfish.TimingWheel(levels=2, bits=2)
+        wheel.schedule(3, "feed", period=5)
+        self.assertEqual([3, 8, 13, 18], [now for now, action in self.run_wheel(wheel, 20)])
+
+    def test_cancelled_events_do_not_fire(self):
+        wheel = simfish.TimingWheel()
+        event = wheel.schedule(2, "sweep", period=1)
+        self.assertEqual([(2, "sweep")], self.run_wheel(wheel, 2))
+        event.cancel()
+        self.assertEqual([], self.run_wheel(wheel, 100))
+
+    def test_events_must_be_in_the_future(self):
+        wheel = simfish.TimingWheel()
+        self.assertRaises(ValueError, wheel.schedule, 0, "now")
+        self.assertRaises(ValueError, wheel.schedule, 1, "never", period=0)
+
+
+class TankScheduleTest(unittest.TestCase):
+
+    def test_automatic_feeder(self):
+        tank = simfish.Tank()
+        tank.schedule(2, lambda tank: tank.put(simfish.FishFood(), x=0, y=0), period=2)
+        for turn in range(10):
+            tank.turn()
+        self.assertEqual(5, len(tank))
+
+    def test_scheduled_actions_precede_feeding(self):
+        tank = simfish.Tank()
+        fish = simfish.SunFish()
+        tank.put(fish, x=4, y=4)
+        tank.schedule(1, lambda tank: tank.put(simfish.FishFood(), x=4, y=4))
+        tank.turn()
+        self.assertEqual(1, len(tank))
+        self.assertEqual(simfish.SunFish.ENERGY + 10 - 1, fish.energy)
+
+    def test_fork_takes_copy_of_schedule(self):
+        tank = simfish.Tank()
+        tank.schedule(1, lambda tank: tank.put(simfish.FishFood()), period=1)
+        fork = tank.fork()
+        fork.scheduler.advance()
+        self.assertEqual(0, tank.scheduler.now)
+        for turn in range(3):
+            tank.turn()
+        self.assertEqual(3, len(tank))
+        self.assertEqual(0, len(fork))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import simfish
+import time
+import simfish_shm
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def read_versions(name, turns, queue):
+    reader = simfish_shm.TankReader(name)
+    try:
+        versions = []
+        while len(versions) < turns:
+            snapshot = reader.snapshot(timeout=5.0)
+            if snapshot is not None and (not versions or snapshot.version != versions[-1][0]):
+                versions.append((snapshot.version, snapshot.population, len(snapshot)))
+        queue.put(versions)
+    finally:
+        reader.close()
+
+
+def read_snapshots(name, duration, queue):
+    reader = simfish_shm.TankReader(name)
+    try:
+        seen = set()
+        reads = 0
+        deadline = time.time() + duration
+        while time.time() < deadline:
+            snapshot = reader.snapshot(timeout=5.0)
+            if snapshot is not None:
+                seen.add((snapshot.temperature, snapshot.population, len(snapshot),
+                          tuple(sorted(snapshot.counts().items()))))
+                reads += 1
+        queue.put((reads, sorted(seen)))
+    except Exception as e:
+        queue.put(repr(e))
+    finally:
+        reader.close()
+
+
+@unittest.skipIf(simfish_shm.shared_memory is None, "Shared memory is not available")
+class SharedMemoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.publisher = simfish_shm.TankPublisher(capacity=64)
+        self.reader = simfish_shm.TankReader(self.publisher.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.publisher.close()
+
+    def test_nothing_published(self):
+        self.assertEqual(None, self.reader.snapshot())
+
+    def test_can_read_published_tank(self):
+        tank = simfish.Tank(temperature=16.5)
+        fish = simfish.SunFish(direction=simfish.EAST)
+        tank.put(fish, x=3, y=4)
+        tank.put(simfish.FishFood(), x=3, y=4)
+        tank.put(simfish.FishFood(), x=3, y=4)
+        self.publisher.publish(tank)
+        snapshot = self.reader.snapshot()
+        self.assertEqual(1, snapshot.version)
+        self.assertEqual(16.5, snapshot.temperature)
+        self.assertEqual((simfish.TANK_WIDTH, simfish.TANK_HEIGHT), (snapshot.width, snapshot.height))
+        self.assertEqual(3, snapshot.population)
+        self.assertEqual([("SunFish", 3, 4, simfish.EAST, 1, fish.energy), ("FishFood", 3, 4, 0, 2, 20.0)],
+                         snapshot.items())
+
+    def test_new_kinds_are_named(self):
+        tank = simfish.Tank()
+        tank.put(simfish.Snail())
+        self.publisher.publish(tank)
+        tank.put(simfish.ClockworkFish())
+        self.publisher.publish(tank)
+        snapshot = self.reader.snapshot()
+        self.assertEqual(2, snapshot.version)
+        self.assertEqual({"Snail": 1, "ClockworkFish": 1}, snapshot.counts())
+
+    def test_records_are_limited_to_capacity(self):
+        tank = simfish.Tank()
+        for x in range(tank.width):
+            for y in range(tank.height):
+                tank.put(simfish.Snail(), x=x, y=y)
+        self.publisher.publish(tank)
+        snapshot = self.reader.snapshot()
+        self.assertEqual(64, len(snapshot))
+        self.assertEqual(tank.width * tank.height, snapshot.population)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_can_read_records_as_array(self):
+        tank = simfish.Tank()
+        tank.put(simfish.DiverFish(), x=5, y=6)
+        self.publisher.publish(tank)
+        records = self.reader.snapshot().array()
+        self.assertEqual([5], list(records["x"]))
+        self.assertEqual([6], list(records["y"]))
+        self.assertEqual([simfish.DiverFish.ENERGY], list(records["energy"]))
+
+    def test_unfinished_publication_is_not_read(self):
+        self.publisher.publish(simfish.Tank())
+        simfish_shm.SEQUENCE.pack_into(self.publisher.buffer, 0, self.publisher.sequence + 1)
+        self.assertRaises(IOError, self.reader.snapshot, 0.01)
+
+    def test_readers_in_other_processes_see_consistent_snapshots(self):
+        tank = simfish.Tank()
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=read_versions, args=(self.publisher.name, 5, queue))
+        process.start()
+        try:
+            for version in range(1, 20000):
+                if version % 50:
+                    tank.put(simfish.ClockworkFish())
+                else:
+                    tank.empty()
+                self.publisher.publish(tank)
+                if not queue.empty():
+                    break
+            versions = queue.get(timeout=10)
+        finally:
+            process.join(10)
+        for version, population, records in versions:
+            self.assertEqual(version % 50, population)
+            self.assertEqual(population, records)
+
+    def test_readers_never_see_a_mixture_of_two_tanks(self):
+        tanks = [simfish.Tank(temperature=12.5), simfish.Tank(temperature=21.5)]
+        tanks[0].put(simfish.Snail(), x=0, y=0)
+        for x in range(2):
+            tanks[1].put(simfish.ClockworkFish(), x=x, y=1)
+        self.publisher.publish(tanks[0])
+        self.publisher.publish(tanks[1])
+        expected = [(12.5, 1, 1, (("ClockworkFish", 0), ("Snail", 1))),
+                    (21.5, 2, 2, (("ClockworkFish", 2), ("Snail", 0)))]
+        queue = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=read_snapshots, args=(self.publisher.name, 2.0, queue))
+                     for i in range(3)]
+        for process in processes:
+            process.start()
+        try:
+            turn = 0
+            while any(process.is_alive() for process in processes):
+                self.publisher.publish(tanks[turn % 2])
+                turn += 1
+            results = [queue.get(timeout=10) for process in processes]
+        finally:
+            for process in processes:
+                process.join(10)
+        for result in results:
+            self.assertTrue(isinstance(result, tuple), result)
+            reads, seen = result
+            self.assertTrue(reads > 0)
+            for snapshot in seen:
+                self.assertTrue(snapshot in expected, snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
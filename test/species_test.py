@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pickle
+import simfish
+import unittest
+
+from testutil import TestTank
+
+
+def definition(name, **overrides):
+    species = {
+        "name": name,
+        "energy": 50,
+        "diet": ["FishFood"],
+        "sprites": {
+            "west": {"alive": ["<    ", "     "], "dead": ["x    ", "     "]},
+            "east": {"alive": ["    >", "     "], "dead": ["    x", "     "]},
+        },
+    }
+    species.update(overrides)
+    return species
+
+
+class SpeciesRegistryTest(unittest.TestCase):
+
+    def test_builtin_species_are_compiled(self):
+        self.assertEqual(["Snail", "SunFish", "DiverFish", "PiranhaFish"], simfish.SPECIES.names)
+        self.assertTrue(issubclass(simfish.SunFish, simfish.Species))
+        self.assertEqual(simfish.SPECIES.index("SunFish"), simfish.SunFish.SPECIES)
+        self.assertEqual(300, simfish.SPECIES.energy[simfish.SunFish.SPECIES])
+
+    def test_diet_table(self):
+        registry = simfish.SPECIES
+        diet = registry.diet[registry.index("PiranhaFish")]
+        self.assertEqual((simfish.FishFood, simfish.SunFish, simfish.DiverFish), diet)
+
+    def test_can_compile_new_species(self):
+        registry = simfish.SpeciesRegistry([
+            definition("Minnow", upward=0.5),
+            definition("Pike", diet=["FishFood", "Minnow"], death="sink"),
+        ], others=[simfish.FishFood])
+        minnow = registry.classes["Minnow"](direction=simfish.EAST)
+        pike = registry.classes["Pike"](direction=simfish.WEST)
+        self.assertEqual(0.5, minnow.upward)
+        self.assertEqual(["    >", "     "], minnow.sprite)
+        self.assertEqual(["<    ", "     "], pike.sprite)
+        self.assertEqual((simfish.FishFood, registry.classes["Minnow"]), pike.diet)
+
+    def test_death_behaviour(self):
+        registry = simfish.SpeciesRegistry([definition("Stone", death="sink")], others=[simfish.FishFood])
+        tank = TestTank()
+        stone = registry.classes["Stone"]()
+        stone.kill()
+        stone.turn(tank)
+        self.assertEqual(1, tank.total_dy)
+
+    def test_unknown_food_is_rejected(self):
+        self.assertRaises(ValueError, simfish.SpeciesRegistry, [definition("Fussy", diet=["Caviar"])])
+
+    def test_unknown_death_is_rejected(self):
+        self.assertRaises(ValueError, simfish.SpeciesRegistry,
+                          [definition("Ghost", death="vanish")], [simfish.FishFood])
+
+    def test_species_can_be_pickled(self):
+        sun_fish = simfish.SunFish(direction=simfish.EAST)
+        copy = pickle.loads(pickle.dumps(sun_fish))
+        self.assertTrue(isinstance(copy, simfish.SunFish))
+        self.assertEqual(sun_fish.energy, copy.energy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import array
+import io
+import os
+import shutil
+import simfish_sweep
+import tempfile
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SweepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "sweep.npz")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_can_expand_grid(self):
+        points = simfish_sweep.expand({"temperature": [14.0, 16.0], "feed_rate": [0.5, 1.0, 2.0]})
+        self.assertEqual(6, len(points))
+        self.assertEqual({"temperature": 14.0, "prey": 20, "piranha_ratio": 0.1, "feed_rate": 0.5}, points[0])
+
+    def test_will_reject_unknown_parameters(self):
+        self.assertRaises(ValueError, simfish_sweep.expand, {"salinity": [1.0]})
+
+    def test_run_is_reproducible(self):
+        point = simfish_sweep.expand({})[0]
+        first = simfish_sweep.run(point, seed=7, turns=20)
+        second = simfish_sweep.run(point, seed=7, turns=20)
+        self.assertEqual(first, second)
+        self.assertEqual(20, len(first["SunFish"]))
+        self.assertTrue(first["SunFish"][0] <= 10)
+        self.assertEqual(2, first["PiranhaFish"][0])
+
+    def test_npy_header_is_aligned(self):
+        data = simfish_sweep.npy(array.array("i", [1, 2, 3]))
+        self.assertEqual(b"\x93NUMPY", data[:6])
+        self.assertEqual(0, (len(data) - 12) % 64)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_npy_can_be_read(self):
+        values = array.array("d", [1.5, 2.5, 3.5])
+        loaded = numpy.load(io.BytesIO(simfish_sweep.npy(values)))
+        self.assertEqual([1.5, 2.5, 3.5], loaded.tolist())
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_can_sweep(self):
+        grid = {"temperature": [14.0, 17.0], "prey": [4]}
+        count = simfish_sweep.sweep(self.path, grid, seeds=2, turns=10, processes=1)
+        self.assertEqual(4, count)
+        data = numpy.load(self.path)
+        self.assertEqual([0, 0, 1, 1], data["point"].tolist())
+        self.assertEqual([0, 1, 0, 1], data["seed"].tolist())
+        self.assertEqual([14.0, 14.0, 17.0, 17.0], data["param/temperature"].tolist())
+        for n in range(count):
+            self.assertEqual(10, len(data["run{0}/SunFish".format(n)]))
+            self.assertEqual(10, len(data["run{0}/temperature".format(n)]))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_can_sweep_in_parallel(self):
+        count = simfish_sweep.sweep(self.path, {"prey": [2, 4]}, seeds=2, turns=5, processes=2)
+        data = numpy.load(self.path)
+        serial = os.path.join(self.directory, "serial.npz")
+        simfish_sweep.sweep(serial, {"prey": [2, 4]}, seeds=2, turns=5, processes=1)
+        expected = numpy.load(serial)
+        for n in range(count):
+            key = "run{0}/FishFood".format(n)
+            self.assertEqual(expected[key].tolist(), data[key].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
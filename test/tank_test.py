@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import copy
+import os
+import random
 import simfish
+import subprocess
+import sys
 import unittest
 
 from testutil import TestFish
@@ -69,6 +74,363 @@ class TankTest(unittest.TestCase):
             tank.turn()
         self.assertEqual(10, fish.turns_taken)
 
+    def test_can_feed_all_animals_in_a_cell(self):
+        tank = simfish.Tank()
+        fishes = [TestFish(energy=50), TestFish(energy=50)]
+        foods = [simfish.FishFood(), simfish.FishFood(), simfish.FishFood()]
+        for item in fishes + foods:
+            tank.put(item, x=3, y=3)
+        tank.feed()
+        self.assertEqual([60, 60], [fish.energy for fish in fishes])
+        self.assertEqual(3, len(tank))
+
+    def test_will_eat_only_once_per_turn(self):
+        tank = simfish.Tank()
+        fish = TestFish(direction=simfish.EAST, energy=50)
+        tank.put(fish, x=0, y=0)
+        for i in range(3):
+            tank.put(simfish.FishFood(), x=0, y=0)
+        tank.turn()
+        self.assertEqual(50 + 10 - 1, fish.energy)
+        self.assertEqual(3, len(tank))
+
+    def test_will_skip_cells_without_predator_and_prey(self):
+        tank = simfish.Tank()
+        snail = simfish.Snail()
+        piranha_fish = simfish.PiranhaFish()
+        tank.put(snail, x=0, y=0)
+        tank.put(piranha_fish, x=0, y=0)
+        mask = tank._masks[(0, 0)]
+        self.assertEqual(0, mask & simfish.appetite(mask))
+        tank.feed()
+        self.assertEqual(2, len(tank))
+
+    def test_piranha_will_feed_on_fish(self):
+        tank = simfish.Tank(temperature=16.0)
+        piranha_fish = simfish.PiranhaFish()
+        tank.put(piranha_fish, x=0, y=0)
+        tank.put(simfish.SunFish(), x=0, y=0)
+        tank.feed()
+        self.assertEqual(1, len(tank))
+        self.assertEqual(simfish.PiranhaFish.ENERGY + simfish.SunFish.ENERGY, piranha_fish.energy)
+
+    def test_cold_piranha_will_not_feed(self):
+        tank = simfish.Tank(temperature=14.0)
+        piranha_fish = simfish.PiranhaFish()
+        tank.put(piranha_fish, x=0, y=0)
+        tank.put(simfish.SunFish(), x=0, y=0)
+        tank.feed()
+        self.assertEqual(2, len(tank))
+        self.assertEqual(simfish.PiranhaFish.ENERGY, piranha_fish.energy)
+
+    def test_can_remove_dead(self):
+        tank = simfish.Tank()
+        fishes = [TestFish(), TestFish()]
+        for fish in fishes:
+            tank.put(fish, x=1, y=1)
+        fishes[0].kill()
+        tank.remove_dead()
+        self.assertEqual(1, len(tank))
+        self.assertEqual([], tank.items_with(fishes[1]))
+
+    def test_can_find_items_near(self):
+        tank = simfish.Tank(width=40, height=40)
+        fish = TestFish()
+        tank.put(fish, x=20, y=20)
+        near = [TestFish(), simfish.FishFood(), TestFish()]
+        tank.put(near[0], x=20, y=20)
+        tank.put(near[1], x=22, y=18)
+        tank.put(near[2], x=18, y=22)
+        far = TestFish()
+        tank.put(far, x=23, y=20)
+        found = tank.items_near(fish, 2)
+        self.assertEqual(3, len(found))
+        for item in near:
+            self.assertTrue(item in found)
+        self.assertFalse(far in found)
+        self.assertFalse(fish in found)
+        self.assertEqual([near[1]], tank.items_near(fish, 2, species=simfish.FishFood))
+
+    def test_items_near_are_clipped_to_tank(self):
+        tank = simfish.Tank()
+        fish = TestFish()
+        other = TestFish()
+        tank.put(fish, x=0, y=0)
+        tank.put(other, x=tank.width - 1, y=tank.height - 1)
+        self.assertEqual([], tank.items_near(fish, 3))
+        self.assertEqual([other], tank.items_near(fish, 100))
+
+    def test_can_find_nearest(self):
+        tank = simfish.Tank(width=60, height=60)
+        piranha_fish = simfish.PiranhaFish()
+        tank.put(piranha_fish, x=30, y=30)
+        near, far = simfish.SunFish(), simfish.SunFish()
+        tank.put(near, x=33, y=27)
+        tank.put(far, x=30, y=35)
+        tank.put(simfish.Snail(), x=31, y=31)
+        self.assertIs(near, tank.nearest(piranha_fish, simfish.SunFish))
+        self.assertIs(near, tank.nearest(piranha_fish, (simfish.SunFish, simfish.DiverFish)))
+        self.assertIs(None, tank.nearest(piranha_fish, simfish.DiverFish))
+
+    def test_can_find_nearest_in_crowded_tank(self):
+        tank = simfish.Tank()
+        for x in range(tank.width):
+            for y in range(tank.height):
+                tank.put(simfish.FishFood(), x=x, y=y)
+        fish = TestFish()
+        tank.put(fish, x=7, y=5)
+        target = TestFish()
+        tank.put(target, x=5, y=5)
+        self.assertIs(target, tank.nearest(fish, TestFish))
+
+    def test_food_dropped_together_is_stacked(self):
+        tank = simfish.Tank()
+        for i in range(200):
+            tank.put(simfish.FishFood(), x=4, y=0)
+        self.assertEqual(200, len(tank))
+        self.assertEqual(1, len(list(tank)))
+        for i in range(tank.height + 1):
+            tank.turn()
+        self.assertEqual([((4, tank.height - 1), 200)],
+                         [(coords, item.count) for coords, items in tank._items.items() for item in items])
+
+    def test_food_piling_on_the_floor_is_stacked(self):
+        tank = simfish.Tank()
+        for y in range(tank.height):
+            tank.put(simfish.FishFood(), x=2, y=y)
+        self.assertEqual(tank.height, len(list(tank)))
+        for i in range(tank.height):
+            tank.turn()
+        self.assertEqual(1, len(list(tank)))
+        self.assertEqual(tank.height, len(tank))
+
+    def test_stacks_move_like_individual_food(self):
+        tank = simfish.Tank()
+        tank.put(simfish.FishFood(), x=2, y=0)
+        tank.put(simfish.FishFood(), x=2, y=1)
+        tank.turn()
+        self.assertEqual([(2, 1), (2, 2)], sorted(tank._items))
+
+    def test_animals_eat_one_portion_from_stack(self):
+        tank = simfish.Tank()
+        fishes = [TestFish(energy=50), TestFish(energy=50)]
+        for i in range(5):
+            tank.put(simfish.FishFood(), x=3, y=3)
+        for fish in fishes:
+            tank.put(fish, x=3, y=3)
+        tank.feed()
+        self.assertEqual([60, 60], [fish.energy for fish in fishes])
+        self.assertEqual(5, len(tank))
+
+    def test_identical_fish_form_a_school(self):
+        tank = simfish.Tank()
+        for i in range(10):
+            tank.put(simfish.SunFish(direction=simfish.EAST), x=3, y=3)
+        tank.put(simfish.SunFish(direction=simfish.WEST), x=3, y=3)
+        self.assertEqual(11, len(tank))
+        self.assertEqual([1, 10], sorted(item.count for item in tank))
+
+    def test_school_splits_as_members_choose_course(self):
+        random.seed(1)
+        tank = simfish.Tank()
+        tank.put(simfish.SunFish.school(100, direction=simfish.EAST), x=5, y=5)
+        tank.turn()
+        self.assertEqual(100, len(tank))
+        self.assertTrue(1 < len(list(tank)) <= 4)
+        for item in tank:
+            if item.direction == simfish.EAST:
+                self.assertEqual(6, tank._positions[item][0])
+
+    def test_school_members_eat_individually(self):
+        tank = simfish.Tank()
+        school = simfish.SunFish.school(3, direction=simfish.EAST)
+        tank.put(school, x=3, y=3)
+        tank.put(simfish.FishFood(), x=3, y=3)
+        tank.feed()
+        self.assertEqual(3, len(tank))
+        self.assertEqual([(1, simfish.SunFish.ENERGY + 10), (2, simfish.SunFish.ENERGY)],
+                         sorted((item.count, item.energy) for item in tank))
+
+    def test_piranha_eats_one_member_of_a_school(self):
+        tank = simfish.Tank(temperature=16.0)
+        piranha_fish = simfish.PiranhaFish()
+        tank.put(simfish.SunFish.school(5), x=0, y=0)
+        tank.put(piranha_fish, x=0, y=0)
+        tank.feed()
+        self.assertEqual(5, len(tank))
+        self.assertEqual(simfish.PiranhaFish.ENERGY + simfish.SunFish.ENERGY, piranha_fish.energy)
+
+    def test_cannot_split_whole_stack(self):
+        tank = simfish.Tank()
+        school = simfish.SunFish.school(3)
+        tank.put(school)
+        self.assertRaises(ValueError, tank.split, school, 3)
+        self.assertRaises(ValueError, tank.split, school, 0)
+        self.assertEqual(1, tank.split(school, 1).count)
+        self.assertEqual(2, school.count)
+
+    def test_split_stack_goes_ahead_of_the_rest(self):
+        tank = simfish.Tank()
+        snail = simfish.Snail()
+        school = simfish.SunFish.school(3, direction=simfish.EAST)
+        tank.put(school, x=1, y=1)
+        tank.put(snail, x=1, y=1)
+        group = tank.split(school, 2)
+        self.assertEqual([group, school], tank.items_with(snail))
+
+    def test_only_neighbouring_items_are_stacked(self):
+        tank = simfish.Tank()
+        fish = [simfish.SunFish(direction=simfish.EAST) for i in range(3)]
+        tank.put(fish[0], x=1, y=1)
+        tank.put(simfish.Snail(), x=1, y=1)
+        tank.put(fish[1], x=1, y=1)
+        tank.put(fish[2], x=1, y=1)
+        self.assertEqual([1, 1, 2], sorted(item.count for item in tank))
+
+    def populate(self, tank, count=40):
+        species = [simfish.SunFish, simfish.DiverFish, simfish.PiranhaFish, simfish.Snail, simfish.FishFood]
+        for i in range(count):
+            tank.put(random.choice(species)(), x=random.randint(0, 3), y=random.randint(0, 3))
+
+    def snapshot(self, tank):
+        return sorted((coords, type(item).__name__, getattr(item, "energy", None),
+                       getattr(item, "direction", None))
+                      for coords, items in tank._items.items() for item in items)
+
+    def test_fork_shares_state_until_changed(self):
+        tank = simfish.Tank()
+        self.populate(tank)
+        fork = tank.fork()
+        self.assertIs(tank._items, fork._items)
+        self.assertEqual(self.snapshot(tank), self.snapshot(fork))
+
+    def test_fork_evolves_independently(self):
+        random.seed(1)
+        tank = simfish.Tank()
+        self.populate(tank)
+        before = self.snapshot(tank)
+        fork = tank.fork()
+        for i in range(20):
+            fork.turn()
+            fork.put(simfish.FishFood())
+        self.assertEqual(before, self.snapshot(tank))
+        self.assertNotEqual(before, self.snapshot(fork))
+
+    def test_parent_changes_do_not_reach_fork(self):
+        random.seed(2)
+        tank = simfish.Tank()
+        self.populate(tank)
+        fork = tank.fork()
+        before = self.snapshot(fork)
+        for i in range(20):
+            tank.turn()
+        tank.remove_dead()
+        tank.cool()
+        self.assertEqual(before, self.snapshot(fork))
+        self.assertEqual(17.0, fork.temperature())
+
+    def test_tanks_stop_copying_on_write_after_a_turn(self):
+        random.seed(5)
+        tank = simfish.Tank()
+        self.populate(tank)
+        fork = tank.fork()
+        before = self.snapshot(fork)
+        tank.turn()
+        self.assertFalse(tank._cow)
+        self.assertTrue(fork._cow)
+        for i in range(10):
+            tank.turn()
+            tank.put(simfish.FishFood())
+        self.assertEqual(before, self.snapshot(fork))
+        fork.turn()
+        self.assertFalse(fork._cow)
+        self.assertEqual(set(), tank._owned_items | fork._owned_items)
+
+    def test_fork_evolves_as_a_copy_would(self):
+        random.seed(3)
+        tank = simfish.Tank()
+        self.populate(tank)
+        reference = copy.deepcopy(tank)
+        fork = tank.fork()
+        grandchild = fork.fork()
+        for target in (reference, fork, grandchild):
+            random.seed(4)
+            for i in range(30):
+                target.turn()
+        self.assertEqual(self.snapshot(reference), self.snapshot(fork))
+        self.assertEqual(self.snapshot(reference), self.snapshot(grandchild))
+
+    def test_cells_are_in_the_order_they_were_occupied(self):
+        tank = simfish.Tank()
+        order = [(7, 0), (0, 1), (3, 3), (1, 0), (5, 2), (0, 0), (2, 6), (9, 1)]
+        for x, y in order:
+            tank.put(simfish.Snail(), x=x, y=y)
+        tank.remove(tank.cells()[1][1][0])
+        tank.put(simfish.Snail(), x=0, y=1)
+        self.assertEqual(order[:1] + order[2:] + order[1:2], [coords for coords, items in tank.cells()])
+        self.assertEqual([coords for coords, items in tank.cells()], [coords for coords, items in tank.fork().cells()])
+
+    def test_stock_puts_one_of_each_species(self):
+        tank = simfish.Tank()
+        simfish.stock(tank)
+        self.assertEqual(["ClockworkFish", "DiverFish", "PiranhaFish", "Snail", "SunFish"],
+                         sorted(type(item).__name__ for item in tank))
+
+    def crowd(self, tank):
+        for y in range(tank.height):
+            for x in range(tank.width):
+                tank.put(random.choice([simfish.SunFish, simfish.PiranhaFish, simfish.FishFood])(), x=x, y=y)
+
+    def recount(self, tank):
+        return sum(item.count for item in tank)
+
+    def test_population_follows_turns(self):
+        random.seed(3)
+        tank = simfish.Tank(temperature=16.0)
+        self.crowd(tank)
+        self.assertEqual(tank.width * tank.height, len(tank))
+        for i in range(20):
+            tank.put(simfish.FishFood.stack(3))
+            tank.put(simfish.SunFish.school(2))
+            tank.turn()
+            self.assertEqual(self.recount(tank), len(tank))
+            if i % 5 == 0:
+                tank.remove_dead()
+                self.assertEqual(self.recount(tank), len(tank))
+
+    def test_population_counts_meals_taken_from_stacks(self):
+        tank = simfish.Tank()
+        fish = TestFish()
+        tank.put(fish, x=1, y=1)
+        tank.put(simfish.FishFood.stack(3), x=1, y=1)
+        fish.eat(tank)
+        self.assertEqual(3, len(tank))
+        self.assertEqual(self.recount(tank), len(tank))
+
+    def test_fork_keeps_its_own_population(self):
+        tank = simfish.Tank()
+        self.crowd(tank)
+        population = len(tank)
+        fork = tank.fork()
+        tank.put(simfish.SunFish.school(5))
+        self.assertEqual(population + 5, len(tank))
+        self.assertEqual(population, len(fork))
+        fork.empty()
+        self.assertEqual(0, len(fork))
+        self.assertEqual(population + 5, len(tank))
+
+    def test_core_does_not_import_numpy(self):
+        code = "import sys, simfish; sys.exit('numpy' in sys.modules)"
+        path = os.path.dirname(os.path.abspath(simfish.__file__))
+        environment = dict(os.environ, PYTHONPATH=path)
+        self.assertEqual(0, subprocess.call([sys.executable, "-c", code], env=environment))
+
+    def test_core_does_not_import_curses(self):
+        code = "import sys, simfish; sys.exit('curses' in sys.modules)"
+        path = os.path.dirname(os.path.abspath(simfish.__file__))
+        environment = dict(os.environ, PYTHONPATH=path)
+        self.assertEqual(0, subprocess.call([sys.executable, "-c", code], env=environment))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,17 +3,22 @@
 
 """ This module contains mock objects for testing both the tank environment
     and the contents individually. Tanks expose a minimal API to allow
-    contained items to interact with them
+    contained items to interact with them. It also contains a harness for
+    differential testing of alternative tank engines against `Tank`.
 """
 
+import collections
+import random
+
 import simfish
 
 class TestTank(object):
     """ Mock tank object for testing.
     """
 
-    def __init__(self):
+    def __init__(self, temperature=17.0):
         self._items_with = []
+        self._temperature = temperature
         self.reset_movement_record()
 
     def reset_movement_record(self):
@@ -35,6 +40,12 @@ class TestTank(object):
     def remove(self, item):
         self._items_with.remove(item)
 
+    def take(self, item):
+        return item.take()
+
+    def temperature(self):
+        return self._temperature
+
 
 class TestFish(simfish.Mobile, simfish.Animal):
     """ Mock fish object for testing.
@@ -53,3 +64,154 @@ class TestFish(simfish.Mobile, simfish.Animal):
             self.swim(tank)
         else:
             self.float_(tank)
+
+
+class DifferentialHarness(object):
+    """ Drives a reference tank engine and a candidate engine through the same
+        randomised scripts of commands from the same random seed, comparing
+        the population, positions, energy and temperature of the two after
+        every command. Each engine is given as a callable returning a new,
+        empty tank with the API of `Tank`. A script which makes the engines
+        differ is shrunk to a minimal script which still does so.
+
+        A put of several alike items in one cell lets an engine stack or
+        school them, so scripts exercise stacks and schools as well as lone
+        items. The count may be left off a put, in which case it is one.
+
+        A script is a list of commands, each a tuple of one of:
+
+            ("put", kind, x, y, direction, count)
+            ("warm", steps)
+            ("cool", steps)
+            ("remove_dead",)
+            ("turn",)
+    """
+
+    KINDS = ("SunFish", "DiverFish", "PiranhaFish", "Snail", "ClockworkFish", "FishFood")
+
+    def __init__(self, reference, candidate, width=8, height=6):
+        self.reference = reference
+        self.candidate = candidate
+        self.width = width
+        self.height = height
+
+    def script(self, rng, length):
+        """ Return a random script of the length provided, drawing upon the
+            `random.Random` instance provided rather than the global one.
+        """
+        commands = []
+        for i in range(length):
+            n = rng.random()
+            if n < 0.35:
+                commands.append(("put", rng.choice(self.KINDS), rng.randrange(self.width),
+                                 rng.randrange(self.height), rng.choice([simfish.EAST, simfish.WEST]),
+                                 rng.choice([1, 1, 2, 3, 5])))
+            elif n < 0.4:
+                commands.append(("warm", rng.randint(1, 30)))
+            elif n < 0.45:
+                commands.append(("cool", rng.randint(1, 30)))
+            elif n < 0.5:
+                commands.append(("remove_dead",))
+            else:
+                commands.append(("turn",))
+        return commands
+
+    def apply(self, tank, command):
+        if command[0] == "put":
+            kind, x, y, direction = command[1:5]
+            for i in range(command[5] if len(command) > 5 else 1):
+                if kind == "FishFood":
+                    item = simfish.FishFood()
+                else:
+                    item = getattr(simfish, kind)(direction=direction)
+                tank.put(item, x=x, y=y)
+        elif command[0] == "warm":
+            tank.warm(command[1])
+        elif command[0] == "cool":
+            tank.cool(command[1])
+        elif command[0] == "remove_dead":
+            tank.remove_dead()
+        elif command[0] == "turn":
+            tank.turn()
+
+    @staticmethod
+    def snapshot(tank):
+        """ Return the state of a tank as a sorted list of (x, y, kind,
+            energy, direction, count) tuples, counting the individuals alike
+            in every respect, followed by the temperature. Individuals are
+            counted whether held alone or within a stack or school.
+        """
+        individuals = collections.Counter()
+        for (x, y), items in tank.cells():
+            for item in items:
+                energy = getattr(item, "energy", None)
+                if isinstance(item, simfish.FishFood):
+                    energy = float(energy) / item.count
+                if energy is not None:
+                    energy = round(energy, 6)
+                key = (x, y, type(item).__name__, energy, getattr(item, "direction", None))
+                individuals[key] += item.count
+        return sorted(key + (count,) for key, count in individuals.items()), round(tank.temperature(), 6)
+
+    def run(self, engine, script, seed):
+        """ Run a script against a new tank of the engine provided, returning
+            the snapshot taken after each command.
+        """
+        random.seed(seed)
+        tank = engine(width=self.width, height=self.height)
+        snapshots = []
+        for command in script:
+            self.apply(tank, command)
+            snapshots.append(self.snapshot(tank))
+        return snapshots
+
+    def divergence(self, script, seed):
+        """ Return the index of the first command after which the engines
+            differ, or None if they never do.
+        """
+        expected = self.run(self.reference, script, seed)
+        actual = self.run(self.candidate, script, seed)
+        for index, (reference, candidate) in enumerate(zip(expected, actual)):
+            if reference != candidate:
+                return index
+        return None
+
+    def shrink(self, script, seed):
+        """ Shrink a script which makes the engines differ, by delta
+            debugging, to one from which no command may be removed without
+            the engines agreeing.
+        """
+        index = self.divergence(script, seed)
+        if index is None:
+            raise ValueError("The engines agree upon the script")
+        script = script[:index + 1]
+        parts = 2
+        while len(script) > 1:
+            size = -(-len(script) // parts)
+            for start in range(0, len(script), size):
+                smaller = script[:start] + script[start + size:]
+                if smaller and self.divergence(smaller, seed) is not None:
+                    script = smaller
+                    parts = max(parts - 1, 2)
+                    break
+            else:
+                if size == 1:
+                    break
+                parts = min(len(script), 2 * parts)
+        return script
+
+    def check(self, seeds=range(20), length=50):
+        """ Compare the engines over a random script for each seed provided,
+            raising an AssertionError describing a minimal failing script if
+            the engines ever differ.
+        """
+        for seed in seeds:
+            script = self.script(random.Random(seed), length)
+            if self.divergence(script, seed) is not None:
+                script = self.shrink(script, seed)
+                index = self.divergence(script, seed)
+                expected = self.run(self.reference, script, seed)[index]
+                actual = self.run(self.candidate, script, seed)[index]
+                raise AssertionError("Engines differ with seed {0} after script:\n    {1}\n"
+                                     "reference: {2}\ncandidate: {3}".format(
+                                         seed, "\n    ".join(map(repr, script)), expected, actual))
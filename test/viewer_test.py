@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import simfish
+import simfish_viewer
+import tempfile
+import unittest
+import zlib
+
+from testutil import TestFish
+
+
+def decode(message):
+    return zlib.decompress(message[simfish_viewer.LENGTH.size:])
+
+
+class FrameEncodingTest(unittest.TestCase):
+
+    def test_can_round_trip_full_frame(self):
+        lines = ["|~~~|", "|abc|", "+---+"]
+        message = simfish_viewer.encode_frame(lines)
+        self.assertEqual(lines, simfish_viewer.apply_message([], decode(message)))
+
+    def test_identical_frames_produce_no_diff(self):
+        lines = ["|~~~|", "|abc|", "+---+"]
+        self.assertEqual(None, simfish_viewer.encode_diff(lines, list(lines)))
+
+    def test_can_apply_diff(self):
+        old = ["|~~~~~~~~~~~~~~~~|", "|a              b|", "+----------------+"]
+        new = ["|~~~~~~~~~~~~~~~~|", "|x              y|", "+----------------+"]
+        message = simfish_viewer.encode_diff(old, new)
+        self.assertEqual(new, simfish_viewer.apply_message(old, decode(message)))
+
+    def test_can_apply_diff_to_shorter_line(self):
+        old = ["|~~~|", "tank temperature is 10.0 degrees"]
+        new = ["|~~~|", "tank temperature is 9.9 degrees"]
+        message = simfish_viewer.encode_diff(old, new)
+        self.assertEqual(new, simfish_viewer.apply_message(old, decode(message)))
+        self.assertEqual(old, simfish_viewer.apply_message(new, decode(simfish_viewer.encode_diff(new, old))))
+
+    def test_can_apply_diff_at_start_of_line(self):
+        old = ["abcdefgh"]
+        new = ["xbcdefgh"]
+        message = simfish_viewer.encode_diff(old, new)
+        self.assertEqual(new, simfish_viewer.apply_message(old, decode(message)))
+
+    def test_diff_only_carries_changed_cells(self):
+        old = [" " * 200]
+        new = [" " * 100 + "o" + " " * 99]
+        payload = decode(simfish_viewer.encode_diff(old, new))
+        self.assertEqual(1 + simfish_viewer.RUN.size + 1, len(payload))
+
+    def test_diff_of_different_shape_is_full_frame(self):
+        old = ["abc"]
+        new = ["abc", "def"]
+        payload = decode(simfish_viewer.encode_diff(old, new))
+        self.assertEqual(simfish_viewer.FULL, payload[:1])
+        self.assertEqual(new, simfish_viewer.apply_message(old, payload))
+
+
+class FrameServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.address = os.path.join(self.directory, "tank.sock")
+        self.server = simfish_viewer.FrameServer(self.address, interval=0.0)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def receive_all(self, client):
+        while client.receive(0.2):
+            pass
+
+    def test_viewer_receives_tank_frames(self):
+        tank = simfish.Tank()
+        fish = TestFish(direction=simfish.EAST)
+        tank.put(fish, x=0, y=0)
+        client = simfish_viewer.FrameClient(self.address)
+        try:
+            self.server.publish(tank.render())
+            self.receive_all(client)
+            self.assertEqual(tank.render(), client.lines)
+            tank.move(fish, 1, 0)
+            self.server.publish(tank.render())
+            self.receive_all(client)
+            self.assertEqual(tank.render(), client.lines)
+        finally:
+            client.close()
+
+    def test_viewers_are_rate_limited(self):
+        self.server.interval = 60.0
+        client = simfish_viewer.FrameClient(self.address)
+        try:
+            self.server.publish(["one"], now=1000.0)
+            self.receive_all(client)
+            self.server.publish(["two"], now=1001.0)
+            self.receive_all(client)
+            self.assertEqual(["one"], client.lines)
+            self.server.publish(["three"], now=1060.0)
+            self.receive_all(client)
+            self.assertEqual(["three"], client.lines)
+        finally:
+            client.close()
+
+    def test_disconnected_viewers_are_dropped(self):
+        client = simfish_viewer.FrameClient(self.address)
+        self.server.publish(["one"])
+        self.assertEqual(1, len(self.server.viewers))
+        client.close()
+        for i in range(3):
+            self.server.publish(["frame {0}".format(i)])
+        self.assertEqual(0, len(self.server.viewers))
+
+
+if __name__ == "__main__":
+    unittest.main()